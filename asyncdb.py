@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from database import *
+
+class AsyncDatabase:
+
+    def __init__(self, executor=None):
+        '''
+        Initialize asyncio facade of Database. All work with SQLite runs
+        in <executor>, the event loop only awaits results. Connection is
+        created in the executor's thread and used only there.
+
+        @executor -- executor with exactly one worker thread, Executor;
+                     new one owned by the database if None
+        '''
+
+        self._own_executor = executor is None
+
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlookup')
+
+        self._executor = executor
+        self._database = Database()
+
+    def __str__(self):
+        '''
+        Returns database name.
+        '''
+
+        return self.name()
+
+    def database(self):
+        '''
+        Returns wrapped Database. It may be used only from the executor.
+        '''
+
+        return self._database
+
+    def executor(self):
+        '''
+        Returns executor running work of the database.
+        '''
+
+        return self._executor
+
+    def name(self):
+        '''
+        Returns database name.
+        '''
+
+        return self._database.name()
+
+    def path(self):
+        '''
+        Returns path to the database file.
+        '''
+
+        return self._database.path()
+
+    def is_connected(self):
+        '''
+        Returns True if database is connected, otherwise returns False.
+        '''
+
+        return self._database.is_connected()
+
+    async def run(self, func, *args, **kwargs):
+        '''
+        Runs <func> with <args> in the executor and returns its result.
+
+        @func -- function working with the database, callable
+        '''
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def connect(self, path, **options):
+        '''
+        Connects database at <path>. <options> are passed to
+        Database.connect().
+
+        @path -- path to database file, str
+        '''
+
+        await self.run(self._database.connect, path, **options)
+
+    async def disconnect(self):
+        '''
+        Disconnects database and shuts down owned executor.
+        Raises NotConnectedError if database is not connected.
+        '''
+
+        try:
+            await self.run(self._database.disconnect)
+        finally:
+            if self._own_executor:
+                self._executor.shutdown(wait=False)
+
+    async def version(self):
+        '''
+        Returns SQLite version.
+        '''
+
+        return await self.run(self._database.version)
+
+    async def table_names(self):
+        '''
+        Returns names of tables from Master.
+        '''
+
+        return await self.run(self._database.table_names)
+
+    async def catalog(self):
+        '''
+        Returns Catalog of schema objects, see Database.catalog().
+        '''
+
+        return await self.run(self._database.catalog)
+
+    async def get_table(self, table_name):
+        '''
+        Returns AsyncTable with <table_name>.
+        Raises TableNotFoundError if table does not exist.
+
+        @table_name -- name of the table, str
+        '''
+
+        table = await self.run(self._database.get_table, table_name)
+        return AsyncTable(table, self)
+
+class AsyncTable:
+
+    def __init__(self, table, database):
+        '''
+        Creates asyncio facade of <table>.
+
+        @table -- wrapped table, Table
+        @database -- database it belongs to, AsyncDatabase
+        '''
+
+        self._table = table
+        self._database = database
+
+    def __str__(self):
+        '''
+        Returns name of the table.
+        '''
+
+        return self.name()
+
+    def name(self):
+        '''
+        Returns name of the table.
+        '''
+
+        return self._table.name()
+
+    def table(self):
+        '''
+        Returns wrapped Table. It may be used only from the executor.
+        '''
+
+        return self._table
+
+    def database(self):
+        '''
+        Returns database the table belongs to.
+        '''
+
+        return self._database
+
+    async def metadata(self):
+        '''
+        Returns metadata of table, see Table.metadata().
+        '''
+
+        return await self._database.run(self._table.metadata)
+
+    async def column_names(self):
+        '''
+        Returns column names of the table.
+        '''
+
+        return await self._database.run(self._table.column_names)
+
+    async def row_count(self, mode=COUNT_EXACT):
+        '''
+        Returns number of rows, see Table.row_count().
+
+        @mode -- COUNT_EXACT, COUNT_ESTIMATE or COUNT_DEFERRED, str
+        '''
+
+        return await self._database.run(self._table.row_count, mode)
+
+    async def page(self, after=None, limit=BATCH_SIZE, descending=False, with_keys=False):
+        '''
+        Returns window of rows, see Table.page().
+        '''
+
+        return await self._database.run(self._table.page, after, limit, descending, with_keys)
+
+    async def show_image(self, img_col, pk_vals):
+        '''
+        Returns content of BLOB column as bytes or None for NULL, see
+        Table.show_image().
+
+        @img_col -- column with stored image, int
+        @pk_vals -- primary key or row key values, list
+        '''
+
+        return await self._database.run(self._table.show_image, img_col, pk_vals)
+
+    async def iter_rows(self, batch_size=BATCH_SIZE, columns=None, batches=False, prefetch=1):
+        '''
+        Asynchronous generator of rows, see Table.iter_rows(). Batches
+        are read in the executor at most <prefetch> ahead of the consumer,
+        so slow consumer holds reading back instead of filling memory.
+        Consumer leaving the loop early should call aclose() to release
+        the cursor before the database is disconnected.
+
+        @batch_size -- number of rows fetched at once, int
+        @columns -- names of selected columns, list(str); all if None
+        @batches -- yield lists of rows instead of single rows, bool
+        @prefetch -- number of batches read ahead, int
+        '''
+
+        loop = asyncio.get_running_loop()
+        executor = self._database.executor()
+        rows = self._table.iter_rows(batch_size, columns, True)
+        pending = deque()
+
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    pending.append(loop.run_in_executor(executor, next, rows, None))
+
+                batch = await pending.popleft()
+
+                if batch is None:
+                    break
+
+                if batches:
+                    yield batch
+                else:
+                    for row in batch:
+                        yield row
+        finally:
+            #Generator must be finished in the thread owning the connection:
+            for future in pending:
+                await asyncio.wait([future])
+            await self._database.run(rows.close)
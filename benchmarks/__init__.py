@@ -0,0 +1,16 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Benchmarks of the database layer. Run from the repository root, e.g.:
+
+    python3 -m benchmarks.run --output results.json
+    python3 -m benchmarks.generate big.db --rows 1000000
+    python3 -m benchmarks.column_objects
+    python3 -m benchmarks.mmap_scan --rows 200000
+
+generate -- synthetic database generator
+run -- timing of the database entry points, results in JSON
+column_objects -- memory and statements of Column objects
+mmap_scan -- scan throughput with mmap_size off and on
+'''
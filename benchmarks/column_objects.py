@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Microbenchmark of Column objects: memory per object and number of
+SQL statements needed to create and inspect all columns of a wide table.
+
+    python3 -m benchmarks.column_objects [column count]
+'''
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from database import Database
+
+COLUMNS = 200
+
+def create_table(path, columns):
+    '''
+    Creates database at <path> with single table "wide" of <columns> columns.
+    
+    @path -- path to database file, str
+    @columns -- number of columns, int
+    '''
+    
+    db = Database()
+    db.connect(path)
+    defs = ["c0 INTEGER PRIMARY KEY"]
+    for i in range(1, columns):
+        defs.append("c{0} TEXT NOT NULL DEFAULT ''".format(i))
+    db.connection().execute("CREATE TABLE wide ({0})".format(", ".join(defs)))
+    db.connection().commit()
+    db.disconnect()
+
+def run(columns=COLUMNS):
+    '''
+    Runs the benchmark and prints results.
+    
+    @columns -- number of columns of the benchmarked table, int
+    '''
+    
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    
+    try:
+        create_table(path, columns)
+        db = Database()
+        db.connect(path)
+        table = db.get_table("wide")
+        
+        statements = []
+        db.connection().set_trace_callback(statements.append)
+        
+        start = time.perf_counter()
+        cols = table.get_columns()
+        for c in cols:
+            c.id()
+            c.data_type()
+            c.is_primary_key()
+            c.is_not_null()
+            c.default_value()
+        elapsed = time.perf_counter() - start
+        
+        db.connection().set_trace_callback(None)
+        
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        cols = table.get_columns()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(s.size_diff for s in after.compare_to(before, "filename"))
+        
+        print("columns:             {0}".format(columns))
+        print("statements executed: {0}".format(len(statements)))
+        print("time:                {0:.3f} ms".format(elapsed * 1000))
+        print("size of one Column:  {0} B".format(sys.getsizeof(cols[0])))
+        print("memory per Column:   {0:.0f} B".format(allocated / float(len(cols))))
+        
+        db.disconnect()
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]))
+    else:
+        run()
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Generator of synthetic SQLite databases for benchmarks.
+
+    python3 -m benchmarks.generate out.db --tables 10 --rows 100000 \
+        --columns 8 --blob-size 4096 --composite-pk
+
+Every table has key column(s), a BLOB column "img" (if blob size is
+not zero) and TEXT/INTEGER/REAL columns up to the column count.
+Content is pseudo-random but the same for the same parameters.
+'''
+
+import os
+import random
+import argparse
+import sqlite3
+
+#Rows inserted by one executemany():
+INSERT_BATCH = 10000
+
+def table_name(i):
+    '''
+    Returns name of <i>-th generated table.
+
+    @i -- index of the table, int
+    '''
+
+    return 'table_{0}'.format(i)
+
+def column_defs(columns, blob_size, composite_pk):
+    '''
+    Returns list of tuples (column name, type) of generated table.
+
+    @columns -- total number of columns, int
+    @blob_size -- size of BLOB values, int; no BLOB column if 0
+    @composite_pk -- use two-column primary key, bool
+    '''
+
+    if composite_pk:
+        defs = [('grp', 'INTEGER'), ('id', 'INTEGER')]
+    else:
+        defs = [('id', 'INTEGER')]
+
+    if blob_size > 0:
+        defs.append(('img', 'BLOB'))
+
+    types = ['TEXT', 'INTEGER', 'REAL']
+    i = 0
+
+    while len(defs) < columns:
+        defs.append(('c{0}'.format(i), types[i % len(types)]))
+        i = i + 1
+
+    return defs
+
+def generate(path, tables=4, rows=10000, columns=6, blob_size=1024, composite_pk=False, seed=0):
+    '''
+    Creates database at <path>; existing file is replaced.
+
+    @path -- path to database file, str
+    @tables -- number of tables, int
+    @rows -- number of rows of every table, int
+    @columns -- number of columns of every table, int
+    @blob_size -- size of BLOB values in bytes, int; no BLOB column if 0
+    @composite_pk -- use two-column primary key, bool
+    @seed -- seed of generated content, int
+    '''
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    rnd = random.Random(seed)
+    blob = bytes(rnd.getrandbits(8) for i in range(blob_size))
+    defs = column_defs(columns, blob_size, composite_pk)
+
+    if composite_pk:
+        pk = 'PRIMARY KEY (grp, id)'
+    else:
+        pk = 'PRIMARY KEY (id)'
+
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA journal_mode = OFF')
+    con.execute('PRAGMA synchronous = OFF')
+
+    for t in range(tables):
+        name = table_name(t)
+        cols = ', '.join(['{0} {1}'.format(n, tp) for n, tp in defs])
+        con.execute('CREATE TABLE {0} ({1}, {2})'.format(name, cols, pk))
+        insert = 'INSERT INTO {0} VALUES ({1})'.format(name, ', '.join(['?'] * len(defs)))
+
+        batch = []
+
+        for r in range(rows):
+            row = []
+            for n, tp in defs:
+                if n == 'grp':
+                    row.append(r % 16)
+                elif n == 'id':
+                    row.append(r)
+                elif tp == 'BLOB':
+                    row.append(blob)
+                elif tp == 'TEXT':
+                    row.append('text {0}'.format(rnd.getrandbits(32)))
+                elif tp == 'INTEGER':
+                    row.append(rnd.getrandbits(31))
+                else:
+                    row.append(rnd.random())
+            batch.append(row)
+
+            if len(batch) == INSERT_BATCH:
+                con.executemany(insert, batch)
+                batch = []
+
+        if len(batch) > 0:
+            con.executemany(insert, batch)
+
+        con.commit()
+
+    con.close()
+
+def add_arguments(parser):
+    '''
+    Adds generator options to <parser>.
+
+    @parser -- parser of command line, argparse.ArgumentParser
+    '''
+
+    parser.add_argument('--tables', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--columns', type=int, default=6)
+    parser.add_argument('--blob-size', type=int, default=1024)
+    parser.add_argument('--composite-pk', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+
+def generate_from_args(path, args):
+    '''
+    Creates database at <path> with options parsed by add_arguments().
+
+    @path -- path to database file, str
+    @args -- parsed options, argparse.Namespace
+    '''
+
+    generate(path, args.tables, args.rows, args.columns, args.blob_size,
+             args.composite_pk, args.seed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic SQLite database.')
+    parser.add_argument('path')
+    add_arguments(parser)
+    args = parser.parse_args()
+    generate_from_args(args.path, args)
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Scan throughput with memory-mapped I/O off and on: all rows of all
+tables are read by Table.iter_rows() through connections differing only
+in mmap_size.
+
+    python3 -m benchmarks.mmap_scan --rows 200000 --blob-size 4096
+    python3 -m benchmarks.mmap_scan --db existing.db --profile browse
+
+Every setting runs in a fresh process. The file is read once before
+measuring, so the numbers compare warm OS page cache reads; cold reads
+depend on the disk more than on SQLite.
+'''
+
+import os
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from database import *
+from benchmarks import generate
+
+#Settings of mmap_size compared by the benchmark:
+SETTINGS = [('off', 0), ('on', 1024 * 1024 * 1024)]
+
+def scan(path, profile, mmap_size, repeat):
+    '''
+    Reads all rows of all tables <repeat> times and returns best time
+    in seconds and number of read rows. Runs in a separate process.
+
+    @path -- path to database file, str
+    @profile -- connection profile, str
+    @mmap_size -- mmap_size of the connection, int
+    @repeat -- number of runs, int
+    '''
+
+    times = []
+    rows = 0
+
+    for i in range(repeat + 1):
+        db = Database()
+        db.connect(path, profile, mmap_size=mmap_size)
+        rows = 0
+        start = time.perf_counter()
+
+        for name in db.table_names():
+            for batch in db.get_table(name).iter_rows(batches=True):
+                rows = rows + len(batch)
+
+        #First run only warms OS page cache:
+        if i > 0:
+            times.append(time.perf_counter() - start)
+        db.disconnect()
+
+    return (min(times), rows)
+
+def run(path, profile, repeat):
+    '''
+    Runs scan() for all SETTINGS and prints throughput.
+
+    @path -- path to database file, str
+    @profile -- connection profile, str
+    @repeat -- number of runs of every setting, int
+    '''
+
+    size = os.path.getsize(path) / (1024.0 * 1024.0)
+    ctx = multiprocessing.get_context('spawn')
+    base = None
+
+    print('file: {0:.1f} MiB, profile: {1}'.format(size, profile))
+
+    for label, mmap_size in SETTINGS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            best, rows = ex.submit(scan, path, profile, mmap_size, repeat).result()
+
+        base = base or best
+        print('mmap {0:<4} {1:8.3f} s {2:10.0f} rows/s {3:8.1f} MiB/s  x{4:.2f}'.format(label,
+              best, rows / best, size / best, base / best))
+
+def main(argv=None):
+    '''
+    Command line entry point.
+
+    @argv -- command line arguments, list(str)
+    '''
+
+    parser = argparse.ArgumentParser(description='Compare scan throughput with mmap off and on.')
+    parser.add_argument('--db', help='scan existing database instead of generated one')
+    parser.add_argument('--profile', default=PROFILE_DEFAULT, choices=sorted(PROFILES.keys()))
+    parser.add_argument('--repeat', type=int, default=3)
+    generate.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    path = args.db
+
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        generate.generate_from_args(path, args)
+
+    try:
+        run(path, args.profile, args.repeat)
+    finally:
+        if args.db is None:
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
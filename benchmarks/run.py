@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Times entry points of the database layer against a synthetic database
+and writes the results to JSON, so runs on different commits can be
+compared.
+
+    python3 -m benchmarks.run --output results.json --rows 100000
+    python3 -m benchmarks.run --db existing.db --case rows --case row_count
+
+Every case runs in a fresh process, so peak RSS of one case is not
+affected by the others. Recorded are wall times of all repeats, peak
+RSS of the process and number of SQL statements executed.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import sqlite3
+import tempfile
+import subprocess
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from database import *
+from benchmarks import generate
+
+#Rows of first page shown when table is opened; same as gui.FETCH:
+OPEN_TABLE_ROWS = 256
+
+#Number of images read by show_image case:
+IMAGES = 100
+
+def case_connect(path, db):
+    '''
+    Connects the database.
+    '''
+
+    db.connect(path)
+
+def case_table_names(path, db):
+    '''
+    Lists tables.
+    '''
+
+    db.table_names()
+
+def case_rows(path, db):
+    '''
+    Reads all rows of all tables.
+    '''
+
+    for name in db.table_names():
+        db.get_table(name).rows()
+
+def case_row_count(path, db):
+    '''
+    Counts rows of all tables.
+    '''
+
+    for name in db.table_names():
+        db.get_table(name).row_count()
+
+def case_metadata(path, db):
+    '''
+    Reads metadata and column properties of all tables.
+    '''
+
+    for name in db.table_names():
+        table = db.get_table(name)
+        table.metadata()
+        table.primary_keys()
+        for col in table.get_columns():
+            col.data_type()
+
+def case_show_image(path, db):
+    '''
+    Reads IMAGES BLOB values of the first table one by one.
+    '''
+
+    table = db.get_table(db.table_names()[0])
+    blobs = [c.id() for c in table.get_columns() if c.data_type() == 'BLOB']
+
+    if len(blobs) == 0:
+        return
+
+    rows, last = table.page(None, IMAGES)
+    ids = table.primary_keys_ids()
+
+    for row in rows:
+        table.show_image(blobs[0], [row[i] for i in ids])
+
+def case_open_table(path, db):
+    '''
+    Headless copy of the work done by SQLookup when a table is activated:
+    first page, column metadata, row total and display text of cells.
+    '''
+
+    table = db.get_table(db.table_names()[0])
+    rows, last = table.page(None, OPEN_TABLE_ROWS)
+    blobs = [c.data_type() == 'BLOB' for c in table.get_columns()]
+    table.row_count(COUNT_ESTIMATE)
+
+    for row in rows:
+        for i in range(len(row)):
+            if blobs[i]:
+                text = '<BLOB>'
+            else:
+                text = str(row[i])
+
+CASES = OrderedDict([
+    ('connect', case_connect),
+    ('table_names', case_table_names),
+    ('rows', case_rows),
+    ('row_count', case_row_count),
+    ('metadata', case_metadata),
+    ('show_image', case_show_image),
+    ('open_table', case_open_table),
+])
+
+def measure(case, path, repeat):
+    '''
+    Runs <case> <repeat> times against database at <path> and returns
+    dictionary with results. Intended to run in a separate process.
+
+    @case -- name of the case from CASES, str
+    @path -- path to database file, str
+    @repeat -- number of runs, int
+    '''
+
+    func = CASES[case]
+    times = []
+    statements = [0]
+
+    def count(stmt):
+        statements[0] = statements[0] + 1
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    for i in range(repeat):
+        db = Database()
+
+        #Connection does not exist before connect case, its statements
+        #are counted by statistics hooked in when it is created:
+        if case == 'connect':
+            db.enable_stats()
+        else:
+            db.connect(path)
+            db.connection().set_trace_callback(count)
+
+        start = time.perf_counter()
+        func(path, db)
+        times.append(time.perf_counter() - start)
+
+        if case == 'connect':
+            statements[0] = statements[0] + db.stats()['traced']
+
+        db.disconnect()
+
+    return OrderedDict([
+        ('case', case),
+        ('repeat', repeat),
+        ('wall_s', times),
+        ('best_s', min(times)),
+        ('statements', statements[0] // repeat),
+        ('rss_before_kb', rss_before),
+        ('peak_rss_kb', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+    ])
+
+def commit():
+    '''
+    Returns current git commit of the repository or None.
+    '''
+
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                      cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return out.decode('ascii').strip()
+
+def run(path, cases, repeat):
+    '''
+    Runs <cases>, each in a fresh process, and returns list of results.
+
+    @path -- path to database file, str
+    @cases -- names of the cases, list(str)
+    @repeat -- number of runs of every case, int
+    '''
+
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+            result = ex.submit(measure, case, path, repeat).result()
+        print('{0:<12} {1:9.4f} s {2:>8} stmts {3:>9} KB'.format(case, result['best_s'],
+              result['statements'], result['peak_rss_kb']), file=sys.stderr)
+        results.append(result)
+
+    return results
+
+def main(argv=None):
+    '''
+    Command line entry point.
+
+    @argv -- command line arguments, list(str)
+    '''
+
+    parser = argparse.ArgumentParser(description='Benchmark the database layer.')
+    parser.add_argument('--db', help='benchmark existing database instead of generated one')
+    parser.add_argument('--case', action='append', choices=list(CASES.keys()),
+                        help='run only this case, may be repeated')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results to this JSON file')
+    generate.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    path = args.db
+    params = None
+
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        generate.generate_from_args(path, args)
+        params = OrderedDict([('tables', args.tables), ('rows', args.rows),
+                              ('columns', args.columns), ('blob_size', args.blob_size),
+                              ('composite_pk', args.composite_pk), ('seed', args.seed)])
+
+    try:
+        report = OrderedDict([
+            ('commit', commit()),
+            ('python', platform.python_version()),
+            ('sqlite', sqlite3.sqlite_version),
+            ('database', args.db),
+            ('generated', params),
+            ('size_bytes', os.path.getsize(path)),
+            ('results', run(path, args.case or list(CASES.keys()), args.repeat)),
+        ])
+    finally:
+        if args.db is None:
+            os.remove(path)
+
+    text = json.dumps(report, indent=2)
+
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Command line interface of SQLookup. Imports only the database layer,
+so scripts do not pay for starting Qt.
+
+    python3 sqlookup.py tables data.db
+    python3 sqlookup.py count data.db --estimate
+    python3 sqlookup.py dump data.db items --where "price > 10" --format jsonl
+    python3 sqlookup.py blob data.db images img 42 > 42.png
+    python3 sqlookup.py stats data.db --timing
+'''
+
+import sys
+import time
+from database import *
+
+#Commands of the interface:
+COMMANDS = ('tables', 'count', 'dump', 'blob', 'stats')
+
+def parser():
+    '''
+    Returns parser of command line arguments.
+    '''
+
+    import argparse
+
+    main = argparse.ArgumentParser(prog='sqlookup', description='Inspect SQLite databases.')
+    sub = main.add_subparsers(dest='command', required=True)
+
+    def command(name, help):
+        cmd = sub.add_parser(name, help=help)
+        cmd.add_argument('file', help='database file')
+        cmd.add_argument('--timing', action='store_true', help='report import and run time')
+        return cmd
+
+    cmd = command('tables', 'list tables and views')
+    cmd.add_argument('--all', action='store_true', help='list indexes and triggers too')
+
+    cmd = command('count', 'count rows')
+    cmd.add_argument('tables', nargs='*', help='counted tables, all if none')
+    cmd.add_argument('--estimate', action='store_true', help='estimate instead of counting')
+
+    cmd = command('dump', 'write rows to stdout')
+    cmd.add_argument('table')
+    cmd.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    cmd.add_argument('--where', help='SQL expression filtering rows')
+    cmd.add_argument('--order-by', action='append', help='sort column, may be repeated')
+    cmd.add_argument('--limit', type=int)
+
+    cmd = command('blob', 'write BLOB value to stdout')
+    cmd.add_argument('table')
+    cmd.add_argument('column')
+    cmd.add_argument('key', nargs='+', help='primary key values of the row, rowid if it has none')
+
+    command('stats', 'show file and schema statistics')
+
+    return main
+
+def cmd_tables(db, args, out):
+    '''
+    Lists tables and views, or all objects of the catalog.
+    '''
+
+    catalog = db.catalog()
+    names = catalog.names() if args.all else db.table_names()
+
+    for name in names:
+        out.write('{0}\t{1}\n'.format(name, catalog.kind(name)))
+
+def cmd_count(db, args, out):
+    '''
+    Prints number of rows of the tables; ? if it can not be estimated.
+    '''
+
+    mode = COUNT_ESTIMATE if args.estimate else COUNT_EXACT
+
+    for name in args.tables or db.catalog().tables():
+        count = db.get_table(name).row_count(mode)
+        out.write('{0}\t{1}\n'.format(name, '?' if count is None else count))
+
+def cmd_dump(db, args, out):
+    '''
+    Streams rows of the table as CSV or JSON Lines; BLOBs are base64
+    encoded.
+    '''
+
+    import base64
+
+    table = db.get_table(args.table)
+    names = table.column_names()
+    cursor = table.query(args.where, (), args.order_by, None, args.limit)
+
+    def text(value):
+        if type(value) == bytes:
+            return base64.b64encode(value).decode('ascii')
+        return value
+
+    if args.format == 'csv':
+        import csv
+        writer = csv.writer(out)
+        writer.writerow(names)
+        write = lambda row: writer.writerow(row)
+    else:
+        import json
+        write = lambda row: out.write(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n')
+
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+
+        if len(rows) == 0:
+            break
+
+        for row in rows:
+            write([text(v) for v in row])
+
+def cmd_blob(db, args, out):
+    '''
+    Copies BLOB value to stdout in chunks.
+    '''
+
+    table = db.get_table(args.table)
+    blob = table.open_blob(table.get_column_by_name(args.column).id(), args.key)
+    target = out.buffer if hasattr(out, 'buffer') else out
+
+    try:
+        while True:
+            chunk = blob.read(BLOB_CHUNK)
+            if not chunk:
+                break
+            target.write(chunk)
+    finally:
+        blob.close()
+
+def cmd_stats(db, args, out):
+    '''
+    Prints file and schema statistics.
+    '''
+
+    import os
+
+    catalog = db.catalog()
+    rows = [('file', db.path()), ('size', os.path.getsize(db.path())),
+            ('sqlite', db.version())]
+
+    for name in ('page_size', 'page_count', 'freelist_count', 'journal_mode', 'encoding',
+                 'user_version', 'schema_version'):
+        rows.append((name, db.pragma(name)))
+
+    rows.extend([('tables', len(catalog.tables())), ('views', len(catalog.views())),
+                 ('indexes', len(catalog.indexes())), ('triggers', len(catalog.triggers()))])
+
+    for name, value in rows:
+        out.write('{0}\t{1}\n'.format(name, value))
+
+def main(argv=None, import_time=None, out=None):
+    '''
+    Runs command given by <argv> and returns exit status. Database is
+    opened read-only with PROFILE_BROWSE.
+
+    @argv -- command line arguments, list(str)
+    @import_time -- seconds spent importing before main() was called,
+                    reported with --timing, float
+    @out -- output stream, file; sys.stdout if None
+    '''
+
+    start = time.perf_counter()
+    args = parser().parse_args(argv)
+    out = out or sys.stdout
+    db = Database()
+
+    try:
+        db.connect(args.file, PROFILE_BROWSE, read_only=True)
+        globals()['cmd_' + args.command](db, args, out)
+    except (GenericError, NotConnectedError, TableNotFoundError, ConnectionError,
+            InvalidFileError, InvalidParameterError, ColumnNotFoundError,
+            RowNotFoundError) as er:
+        sys.stderr.write('sqlookup: {0}\n'.format(er))
+        return 1
+    except BrokenPipeError:
+        return 0
+    finally:
+        if db.is_connected():
+            db.disconnect()
+
+    if args.timing:
+        sys.stderr.write('import: {0:.1f} ms, run: {1:.1f} ms\n'.format(
+                         (import_time or 0) * 1000, (time.perf_counter() - start) * 1000))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,113 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import io
+import os
+import math
+import re
+import time
+import queue
+import threading
 import sqlite3 as sl
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from exceptions import *
 
+#NumPy module loaded by _numpy() on first use; False if not installed:
+np = None
+
+#Modes of Table.row_count():
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_DEFERRED = 'deferred'
+
+#Default number of rows fetched at once by Table.iter_rows():
+BATCH_SIZE = 1000
+
+#Default maximal number of connections of ReadPool:
+POOL_SIZE = 4
+
+#Number of bytes read at once from BLOB when streaming with substr():
+BLOB_CHUNK = 64 * 1024
+
+#Names of rowid, in order of use; a column with the name hides it:
+ROWID_ALIASES = ('rowid', '_rowid_', 'oid')
+
+#Table options after the column list declaring table without rowid:
+WITHOUT_ROWID = re.compile(r'\bWITHOUT\s+ROWID\b', re.IGNORECASE)
+
+#Maximal number of parameters bound to one statement:
+MAX_VARIABLES = 999
+
+#Number of latest latencies of every statement kept by Stats for p95:
+STATS_SAMPLES = 1000
+
+#Connection profiles of Database.connect():
+PROFILE_DEFAULT = 'default'
+PROFILE_BROWSE = 'browse'
+PROFILE_SNAPSHOT = 'snapshot'
+
+#Options of Database.connect() applied as PRAGMAs, in this order:
+PRAGMA_OPTIONS = ('mmap_size', 'cache_size', 'temp_store', 'query_only')
+
+#Options of Database.connect() used when opening the file:
+OPEN_OPTIONS = ('read_only', 'immutable', 'check_same_thread')
+
+#Options of profiles; options missing in a profile keep SQLite defaults.
+#BROWSE reads local file through 256 MiB mmap and 64 MiB page cache and
+#refuses writes; SNAPSHOT adds immutable=1, file must not change then:
+PROFILES = {
+    PROFILE_DEFAULT: {},
+    PROFILE_BROWSE: {'mmap_size': 256 * 1024 * 1024, 'cache_size': -65536,
+                     'temp_store': 'MEMORY', 'query_only': True},
+    PROFILE_SNAPSHOT: {'mmap_size': 256 * 1024 * 1024, 'cache_size': -65536,
+                       'temp_store': 'MEMORY', 'query_only': True, 'immutable': True},
+}
+
+def _numpy():
+    '''
+    Private: Returns NumPy module or None if it is not installed. It is
+    imported when first needed, so importing this module stays cheap.
+    '''
+    
+    global np
+    
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+            
+    return np or None
+    
+def _file_uri(path):
+    '''
+    Private: Returns SQLite URI of file at <path>. Characters with
+    meaning in URI are escaped.
+    '''
+    
+    path = path.replace(os.sep, '/')
+    
+    #Windows path with drive letter:
+    if len(path) > 1 and path[1] == ':':
+        path = '/' + path
+        
+    for ch, code in (('%', '%25'), ('?', '%3f'), ('#', '%23')):
+        path = path.replace(ch, code)
+        
+    return 'file:' + path
+    
+def quote(identifier):
+    '''
+    Returns <identifier> quoted for use in SQL statement.
+    
+    @identifier -- name of table or column, str
+    '''
+    
+    return '"' + identifier.replace('"', '""') + '"'
+
 class Database:
 
     def __init__(self):
@@ -15,6 +119,14 @@ class Database:
         self._connected = False
         self._db_name = ""
         self._full_path = ""
+        self._schema = {}
+        self._schema_version = None
+        self._catalog = None
+        self._options = {}
+        self._row_counts = {}
+        self._row_counts_version = None
+        self._read_pool = None
+        self._stats = None
         
     def __str__(self):
         '''
@@ -55,21 +167,82 @@ class Database:
         
         return self._full_path
         
-    def connect(self, path):
+    def options(self):
+        '''
+        Returns options the database was connected with, see connect().
+        '''
+        
+        return dict(self._options)
+        
+    def connect(self, path, profile=PROFILE_DEFAULT, **options):
         '''
         Connects the database or create a new SQLite3 database.
+        Connection is set up by options of <profile> from PROFILES,
+        overridden by <options>. Read-only and immutable databases are
+        opened through URI and must exist.
+        Raises InvalidParameterError for unknown profile or option.
+        Raises ConnectionError if database can not be opened.
         
         @path -- path to database file, str
-        '''
+        @profile -- name of the profile, str
+        @options -- options overriding the profile:
+            read_only -- open database in mode=ro, bool
+            immutable -- open database with immutable=1, file must not be
+                         changed while connected, bool
+            check_same_thread -- allow use of connection only in the
+                                 thread which created it, bool
+            mmap_size -- bytes of the file read through mmap, int
+            cache_size -- pages, or KiB if negative, of page cache, int
+            temp_store -- DEFAULT, FILE or MEMORY, str
+            query_only -- refuse all writes, bool
+        '''
+        
+        if profile not in PROFILES:
+            raise InvalidParameterError(profile, False)
+            
+        settings = dict(PROFILES[profile])
+        settings.update(options)
+        
+        for name in settings:
+            if name not in PRAGMA_OPTIONS and name not in OPEN_OPTIONS:
+                raise InvalidParameterError(name, False)
+                
+        read_only = settings.get('read_only', False)
+        immutable = settings.get('immutable', False)
+        check_same_thread = settings.get('check_same_thread', True)
         
         try:
-            self._connection = sl.connect(path)
+            if read_only or immutable:
+                uri = _file_uri(path) + '?mode=ro'
+                if immutable:
+                    uri = uri + '&immutable=1'
+                self._connection = sl.connect(uri, uri=True, check_same_thread=check_same_thread,
+                                              factory=StatsConnection)
+            else:
+                self._connection = sl.connect(path, check_same_thread=check_same_thread,
+                                              factory=StatsConnection)
         except sl.OperationalError as er:
             raise ConnectionError(str(er), path)
         self._connected = True
         self._db_name = self._get_db_name(path)
         self._full_path = path
+        self._options = settings
+        
+        #PRAGMAs of the profile are counted when statistics are enabled:
+        if self._stats is not None:
+            self._install_stats()
+            
+        try:
+            for name in PRAGMA_OPTIONS:
+                if name in settings:
+                    self.set_pragma(name, settings[name])
+        except sl.DatabaseError as er:
+            self.disconnect()
+            raise ConnectionError(str(er), path)
             
+        self.clear_schema_cache()
+        self.clear_row_counts()
+        
     def disconnect(self):
         '''
         Disconnect currently connected database.
@@ -77,11 +250,103 @@ class Database:
         '''
         
         if self.is_connected():
+            self.close_read_pool()
             self._connection.close()
             self._connected = False
+            self.clear_schema_cache()
+            self.clear_row_counts()
         else:
             raise NotConnectedError(self._db_name)
 
+    def open_read_pool(self, max_size=POOL_SIZE, immutable=False, pragmas=None,
+                       profile=PROFILE_DEFAULT):
+        '''
+        Creates pool of read-only connections to the database file and
+        returns it. Readers from the pool may run in parallel with each
+        other and, in WAL journal mode, with writes of main connection.
+        Raises NotConnectedError if database is not connected.
+        
+        @max_size -- maximal number of connections, int
+        @immutable -- open connections with immutable=1, bool
+        @pragmas -- PRAGMAs set on every new connection, dict
+        @profile -- connection profile of the connections, str
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self._db_name)
+            
+        self.close_read_pool()
+        stats = self._stats if self.stats_enabled() else None
+        self._read_pool = ReadPool(self._full_path, max_size, immutable, pragmas, profile, stats)
+        return self._read_pool
+        
+    def read_pool(self):
+        '''
+        Returns pool of read-only connections or None if it is not open.
+        '''
+        
+        return self._read_pool
+        
+    def close_read_pool(self):
+        '''
+        Closes pool of read-only connections if it is open.
+        '''
+        
+        if self._read_pool is not None:
+            self._read_pool.close()
+            self._read_pool = None
+            
+    def pragma(self, name):
+        '''
+        Returns current value of PRAGMA <name>.
+        Raises NotConnectedError if database is not connected.
+        
+        @name -- name of the PRAGMA, str
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self._db_name)
+            
+        if not name.replace('_', '').isalnum():
+            raise InvalidParameterError(name, False)
+            
+        row = self._connection.execute('PRAGMA ' + name).fetchone()
+        
+        if row is None:
+            return None
+        return row[0]
+        
+    def set_pragma(self, name, value):
+        '''
+        Sets PRAGMA <name> to <value> and returns the value reported
+        by SQLite, if any.
+        Raises NotConnectedError if database is not connected.
+        
+        @name -- name of the PRAGMA, str
+        @value -- new value, int or str
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self._db_name)
+            
+        if not name.replace('_', '').isalnum():
+            raise InvalidParameterError(name, False)
+            
+        if type(value) == bool:
+            value = int(value)
+            
+        if type(value) == int or value.replace('_', '').isalnum():
+            value = str(value)
+        else:
+            value = "'" + value.replace("'", "''") + "'"
+            
+        cur = self._connection.execute('PRAGMA ' + name + ' = ' + value)
+        row = cur.fetchone()
+        
+        if row is None:
+            return None
+        return row[0]
+
     def _get_db_name(self, path):
         '''
         Private: Gets the database name from <path>.
@@ -124,23 +389,226 @@ class Database:
             
     def table_names(self):
         '''
-        Gets the table names from Master.
+        Gets the table names from Master; views are included, indexes
+        and triggers are not. See catalog() for other objects.
+        Raises NotConnectedError if database is not connected.
+        '''
+        
+        return self.catalog().tables(views=True)
+        
+    def catalog(self):
+        '''
+        Returns Catalog of schema objects listed in Master. It is loaded
+        by one query and cached until schema version of the database
+        changes.
+        Raises InvalidFileError if file is not a database.
+        Raises NotConnectedError if database is not connected.
+        '''
+        
+        self._check_schema()
+        
+        if self._catalog is None:
+            try:
+                cur = self._connection.execute('SELECT type, name, tbl_name, sql FROM sqlite_master')
+            except sl.DatabaseError as er:
+                raise InvalidFileError(str(er), self.name())
+            self._catalog = Catalog(cur.fetchall())
+            
+        return self._catalog
+
+    def schema_version(self):
+        '''
+        Returns schema version of the database. SQLite increments it
+        on every change of the schema.
         Raises NotConnectedError if database is not connected.
         '''
         
         if self.is_connected():
             try:
-                cur = self._connection.execute('SELECT Name FROM sqlite_master')
+                cur = self._connection.execute('PRAGMA schema_version')
             except sl.DatabaseError as er:
                 raise InvalidFileError(str(er), self.name())
-                
-            tbls = cur.fetchall()
-            tables = []
-            for tbl in tbls:
-                tables.append(tbl[0])
-            return tables
+            return cur.fetchone()[0]
+        else:
+            raise NotConnectedError(self._db_name)
+            
+    def table_info(self, table_name):
+        '''
+        Returns cached result of PRAGMA table_info for <table_name>.
+        Cache is loaded once per table and dropped whenever schema
+        version of the database changes.
+        If table does not exist returns empty tuple.
+        Raises NotConnectedError if database is not connected.
+        
+        @table_name -- name of the table, str
+        '''
+        
+        self._check_schema()
+        info = self._schema.get(table_name)
+        
+        if info is None:
+            cur = self._connection.execute('PRAGMA table_info(' + quote(table_name) + ')')
+            info = tuple(cur.fetchall())
+            self._schema[table_name] = info
+            
+        return info
+        
+    def clear_schema_cache(self):
+        '''
+        Drops cached schema information.
+        '''
+        
+        self._schema = {}
+        self._schema_version = None
+        self._catalog = None
+        
+    def _check_schema(self):
+        '''
+        Private: Drops cached schema information if schema version
+        changed since it was loaded.
+        '''
+        
+        version = self.schema_version()
+        
+        if version != self._schema_version:
+            self._schema = {}
+            self._catalog = None
+            self._schema_version = version
+            
+    def data_version(self):
+        '''
+        Returns tuple identifying current state of data in the database.
+        It changes whenever the data is modified either through this
+        connection or committed by any other connection.
+        Raises NotConnectedError if database is not connected.
+        '''
+        
+        if self.is_connected():
+            cur = self._connection.execute('PRAGMA data_version')
+            return (cur.fetchone()[0], self._connection.total_changes)
         else:
             raise NotConnectedError(self._db_name)
+            
+    def cached_row_count(self, table_name):
+        '''
+        Returns row count of <table_name> stored by set_row_count().
+        Returns None if count is unknown or data has changed since.
+        
+        @table_name -- name of the table, str
+        '''
+        
+        version = self.data_version()
+        
+        if version != self._row_counts_version:
+            self._row_counts = {}
+            self._row_counts_version = version
+            
+        return self._row_counts.get(table_name)
+        
+    def set_row_count(self, table_name, count):
+        '''
+        Stores exact row count of <table_name> for current state of data.
+        
+        @table_name -- name of the table, str
+        @count -- number of rows, int
+        '''
+        
+        version = self.data_version()
+        
+        if version != self._row_counts_version:
+            self._row_counts = {}
+            self._row_counts_version = version
+            
+        self._row_counts[table_name] = count
+        
+    def clear_row_counts(self):
+        '''
+        Drops stored row counts.
+        '''
+        
+        self._row_counts = {}
+        self._row_counts_version = None
+        
+    def enable_stats(self, enabled=True):
+        '''
+        Turns collecting of statement statistics on or off. Collected
+        statistics are kept when turned off, see stats(). Connections of
+        the read pool collect into the same statistics.
+        
+        @enabled -- collect statistics, bool
+        '''
+        
+        if enabled:
+            if self._stats is None:
+                self._stats = Stats()
+            if self.is_connected():
+                self._install_stats()
+        elif self.is_connected():
+            self._uninstall_stats()
+            
+        if self._read_pool is not None:
+            self._read_pool.share_stats(self._stats if enabled else None)
+            
+    def share_stats(self, stats):
+        '''
+        Collects statement statistics into <stats>, which may be shared
+        with other connections; stops collecting if <stats> is None.
+        
+        @stats -- collected statistics, Stats
+        '''
+        
+        self._stats = stats
+        
+        if not self.is_connected():
+            return
+            
+        if stats is None:
+            self._uninstall_stats()
+        else:
+            self._install_stats()
+            
+    def stats_enabled(self):
+        '''
+        Returns True if statement statistics are collected,
+        otherwise returns False.
+        '''
+        
+        return self.is_connected() and self._connection.stats is not None
+        
+    def stats(self):
+        '''
+        Returns statistics of statements executed since enable_stats()
+        or reset_stats(), see Stats.summary(). Returns None if they were
+        never enabled.
+        '''
+        
+        if self._stats is None:
+            return None
+        return self._stats.summary()
+        
+    def reset_stats(self):
+        '''
+        Drops collected statement statistics.
+        '''
+        
+        if self._stats is not None:
+            self._stats.reset()
+            
+    def _install_stats(self):
+        '''
+        Private: Hooks statistics into current connection.
+        '''
+        
+        self._connection.stats = self._stats
+        self._connection.set_trace_callback(self._stats.traced)
+        
+    def _uninstall_stats(self):
+        '''
+        Private: Unhooks statistics from current connection.
+        '''
+        
+        self._connection.stats = None
+        self._connection.set_trace_callback(None)
                                     
     def get_table(self, table_name):
         '''
@@ -151,13 +619,142 @@ class Database:
         @table_name -- Name of the table, str
         '''
         
-        tables = self.table_names()
+        if self.catalog().is_table(table_name, views=True):
+            return Table(table_name, self)
+            
+        raise TableNotFoundError(table_name, self.name())
+        
+class Catalog:
+
+    def __init__(self, rows):
+        '''
+        Constructs catalog of schema objects from rows of Master:
+        (type, name, tbl_name, sql). Objects are looked up by name and
+        listed by type in order of Master.
+        
+        @rows -- rows of Master, list(tuple)
+        '''
+        
+        self._objects = {}
+        self._by_type = {}
+        self._by_table = {}
         
-        for table in tables:
-            if table == table_name:
-                return Table(table_name, self)
+        for row in rows:
+            kind, name, table_name = row[0], row[1], row[2]
+            self._objects[name] = tuple(row)
+            self._by_type.setdefault(kind, []).append(name)
+            
+            if kind not in ('table', 'view'):
+                self._by_table.setdefault(table_name, []).append(name)
                 
-        raise TableNotFoundError(table_name, self.name())
+    def names(self):
+        '''
+        Returns names of all objects.
+        '''
+        
+        return list(self._objects.keys())
+        
+    def tables(self, views=False):
+        '''
+        Returns names of tables, and of views after them if <views>.
+        
+        @views -- include views, bool
+        '''
+        
+        names = list(self._by_type.get('table', []))
+        
+        if views:
+            names.extend(self._by_type.get('view', []))
+        return names
+        
+    def views(self):
+        '''
+        Returns names of views.
+        '''
+        
+        return list(self._by_type.get('view', []))
+        
+    def indexes(self, table_name=None):
+        '''
+        Returns names of indexes, of <table_name> only if given.
+        
+        @table_name -- name of the table, str
+        '''
+        
+        return self._dependent('index', table_name)
+        
+    def triggers(self, table_name=None):
+        '''
+        Returns names of triggers, of <table_name> only if given.
+        
+        @table_name -- name of the table, str
+        '''
+        
+        return self._dependent('trigger', table_name)
+        
+    def exists(self, name):
+        '''
+        Returns True if object with <name> exists, otherwise returns False.
+        
+        @name -- name of the object, str
+        '''
+        
+        return name in self._objects
+        
+    def is_table(self, name, views=False):
+        '''
+        Returns True if <name> is a table, or a view if <views>,
+        otherwise returns False.
+        
+        @name -- name of the object, str
+        @views -- accept views, bool
+        '''
+        
+        kind = self.kind(name)
+        return kind == 'table' or (views and kind == 'view')
+        
+    def kind(self, name):
+        '''
+        Returns type of object <name>: table, view, index or trigger;
+        None if it does not exist.
+        
+        @name -- name of the object, str
+        '''
+        
+        obj = self._objects.get(name)
+        return obj[0] if obj is not None else None
+        
+    def table_name(self, name):
+        '''
+        Returns name of the table object <name> belongs to; None if it
+        does not exist.
+        
+        @name -- name of the object, str
+        '''
+        
+        obj = self._objects.get(name)
+        return obj[2] if obj is not None else None
+        
+    def sql(self, name):
+        '''
+        Returns SQL creating object <name>; None if it does not exist or
+        was created implicitly.
+        
+        @name -- name of the object, str
+        '''
+        
+        obj = self._objects.get(name)
+        return obj[3] if obj is not None else None
+        
+    def _dependent(self, kind, table_name):
+        '''
+        Private: Returns names of objects of <kind> belonging to
+        <table_name>, or all of them if <table_name> is None.
+        '''
+        
+        if table_name is None:
+            return list(self._by_type.get(kind, []))
+        return [n for n in self._by_table.get(table_name, []) if self._objects[n][0] == kind]
         
 class Table:
 
@@ -240,13 +837,7 @@ class Table:
         Returns True if exists, otherwise returns False.
         '''
         
-        tables = self.database().table_names()
-        
-        for table in tables:
-            if table == self._name:
-                return True
-                
-        return False
+        return self.database().catalog().is_table(self._name, views=True)
             
     def metadata(self):
         '''
@@ -257,11 +848,9 @@ class Table:
         '''
         
         if self.is_connected():
-            cur = self.connection().execute('PRAGMA table_info(' + self.name() + ')')
-            meta = cur.fetchall()
-            return meta
+            return list(self.database().table_info(self.name()))
         else:
-            raise NotConnectedError(self._db_name)
+            raise NotConnectedError(self.database_name())
         
     def column_names(self):
         '''
@@ -279,43 +868,320 @@ class Table:
     def rows(self):
         '''
         Get rows from table.
-        If table does not exists returns empty list.
+        Raises TableNotFoundError if table does not exist.
         Raises NotConnectedError if database is not connected.
         '''
         
-        if self.is_connected():
-            try:
-                cur = self.connection().execute('SELECT * FROM ' + self.name())
-            except sl.OperationalError:
-                raise TableNotFoundError(self.name(), self.db_name())
-                
-            rows = []
-            
-            while True:
-                row = cur.fetchone()
-                
-                if row == None:
-                    break
-                    
-                rows.append(row)
-                    
-            return rows
-        else:
-            raise NotConnectedError(self.database().name())
+        return list(self.iter_rows())
         
-    def column_count(self):
-        '''
-        Returns number of columns.
+    def iter_rows(self, batch_size=BATCH_SIZE, columns=None, batches=False):
         '''
+        Generator of rows from table. Rows are fetched from SQLite in
+        batches of <batch_size>, so only one batch is held in memory.
+        Raises TableNotFoundError if table does not exist.
+        Raises NotConnectedError if database is not connected.
         
-        return len(self.column_names())
-        
-    def row_count(self):
-        '''
-        Returns number of rows.
+        @batch_size -- number of rows fetched at once, int
+        @columns -- names of selected columns, list(str); all if None
+        @batches -- yield lists of rows instead of single rows, bool
         '''
         
-        return len(self.rows())
+        if not self.is_connected():
+            raise NotConnectedError(self.database_name())
+            
+        if batch_size < 1:
+            raise InvalidParameterError(batch_size, False)
+            
+        if columns is None:
+            select = '*'
+        else:
+            select = ', '.join([quote(c) for c in columns])
+            
+        try:
+            cur = self.connection().execute('SELECT ' + select + ' FROM ' + quote(self.name()))
+        except sl.OperationalError:
+            raise TableNotFoundError(self.name(), self.database_name())
+            
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                
+                if len(rows) == 0:
+                    break
+                    
+                if batches:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+        finally:
+            cur.close()
+        
+    def query(self, where=None, params=(), order_by=None, columns=None, limit=None):
+        '''
+        Runs SELECT on the table with filtering and ordering done by
+        SQLite and returns cursor streaming the rows. Column names are
+        checked and quoted; values belong to <params>, not to <where>.
+        Raises ColumnNotFoundError for unknown column.
+        Raises GenericError if SQLite rejects the statement.
+        Raises NotConnectedError if database is not connected.
+        
+        @where -- SQL expression of WHERE clause with ? parameters, str
+        @params -- parameters of <where>, list
+        @order_by -- column names or tuples (column name, descending), list
+        @columns -- names of selected columns, list(str); all if None
+        @limit -- maximal number of rows, int; all if None
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self.database_name())
+            
+        names = self.column_names()
+        
+        if columns is None:
+            select = '*'
+        else:
+            for c in columns:
+                if c not in names:
+                    raise ColumnNotFoundError("name", c, self.name())
+            select = ', '.join([quote(c) for c in columns])
+            
+        stmt = 'SELECT ' + select + ' FROM ' + quote(self.name())
+        params = list(params)
+        
+        if where:
+            stmt = stmt + ' WHERE ' + where
+            
+        if order_by:
+            terms = []
+            for term in order_by:
+                if type(term) == str:
+                    term = (term, False)
+                if term[0] not in names:
+                    raise ColumnNotFoundError("name", term[0], self.name())
+                if term[1]:
+                    terms.append(quote(term[0]) + ' DESC')
+                else:
+                    terms.append(quote(term[0]))
+            stmt = stmt + ' ORDER BY ' + ', '.join(terms)
+            
+        if limit is not None:
+            stmt = stmt + ' LIMIT ?'
+            params.append(limit)
+            
+        try:
+            return self.connection().execute(stmt, params)
+        except sl.Error as er:
+            raise GenericError(str(er))
+            
+    def page(self, after=None, limit=BATCH_SIZE, descending=False, with_keys=False):
+        '''
+        Returns window of at most <limit> rows ordered by row key, see
+        row_key(), starting right after key <after>. Rows are located
+        through the key index, so reading a page deep in the table costs
+        the same as reading the first one. Returns tuple (rows, last)
+        where <last> is the key of the last returned row to be passed as
+        <after> for the next page; it is None if no rows were returned.
+        With <with_keys> every row starts with its row key values.
+        Raises TableNotFoundError if table does not exist, is a view or
+        has no row key; such tables are read by iter_rows().
+        Raises NotConnectedError if database is not connected.
+        
+        @after -- row key values of the preceding row, tuple; or single
+                  value for one-column row key; None for first page
+        @limit -- maximal number of rows, int
+        @descending -- order rows from the highest key, bool
+        @with_keys -- keep row key values in front of row values, bool
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self.database_name())
+            
+        #Comparison with NULL in key would skip rows, so rowid tables are
+        #paged by rowid; rowid of a view is NULL, so it can not be paged:
+        keys = [quote(k) for k in self.row_key()]
+        
+        if len(keys) == 0:
+            raise TableNotFoundError(self.name(), self.database_name())
+            
+        if after is not None and type(after) not in (tuple, list):
+            after = (after,)
+            
+        if after is not None and len(after) != len(keys):
+            raise InvalidParameterError(after, False)
+            
+        #Key is selected explicitly; positions of table_info do not
+        #match SELECT * when the table has generated columns:
+        stmt = 'SELECT ' + ', '.join(keys) + ', * FROM ' + quote(self.name())
+        params = []
+        
+        if after is not None:
+            if descending:
+                op = ' < '
+            else:
+                op = ' > '
+                
+            if len(keys) == 1:
+                stmt = stmt + ' WHERE ' + keys[0] + op + '?'
+            else:
+                stmt = stmt + ' WHERE (' + ', '.join(keys) + ')' + op
+                stmt = stmt + '(' + ', '.join(['?'] * len(keys)) + ')'
+            params.extend(after)
+            
+        if descending:
+            stmt = stmt + ' ORDER BY ' + ', '.join([k + ' DESC' for k in keys])
+        else:
+            stmt = stmt + ' ORDER BY ' + ', '.join(keys)
+            
+        stmt = stmt + ' LIMIT ?'
+        params.append(limit)
+        
+        try:
+            rows = self.connection().execute(stmt, params).fetchall()
+        except sl.OperationalError:
+            raise TableNotFoundError(self.name(), self.database_name())
+            
+        if len(rows) == 0:
+            return (rows, None)
+            
+        last = tuple(rows[-1][:len(keys)])
+        
+        if not with_keys:
+            rows = [row[len(keys):] for row in rows]
+        return (rows, last)
+        
+    def edit_session(self):
+        '''
+        Returns new EditSession buffering changes of the table.
+        '''
+        
+        return EditSession(self)
+        
+    def to_columns(self, columns=None, batch_size=BATCH_SIZE):
+        '''
+        Reads table into one typed buffer per column. Returns ordered
+        dictionary mapping column name to tuple (values, mask) where
+        mask is True (1) for NULL values. With NumPy installed both are
+        NumPy arrays, otherwise values are array.array and mask is
+        array.array('B'). Columns with INTEGER affinity are stored as
+        64-bit integers, REAL as doubles and NUMERIC as integers, or as
+        doubles if it holds floats and integers exact as doubles; TEXT,
+        BLOB and columns holding values which do not fit are stored as
+        objects (list without NumPy). Buffers are filled batch by batch.
+        Raises NotConnectedError if database is not connected.
+        
+        @columns -- names of the columns, list(str); all if None
+        @batch_size -- number of rows fetched at once, int
+        '''
+        
+        if columns is None:
+            cols = self.get_columns() or []
+        else:
+            cols = [self.get_column_by_name(c) for c in columns]
+            
+        buffers = [ColumnBuffer(c.affinity()) for c in cols]
+        
+        for batch in self.iter_rows(batch_size, [c.name() for c in cols], True):
+            for buf, values in zip(buffers, zip(*batch)):
+                buf.extend(values)
+                
+        result = OrderedDict()
+        
+        for c, buf in zip(cols, buffers):
+            result[c.name()] = buf.result()
+            
+        return result
+        
+    def column_count(self):
+        '''
+        Returns number of columns.
+        '''
+        
+        return len(self.column_names())
+        
+    def row_count(self, mode=COUNT_EXACT):
+        '''
+        Returns number of rows.
+        In COUNT_EXACT mode rows are counted by SQLite and the result is
+        remembered by the database. COUNT_ESTIMATE mode returns number
+        of rows from sqlite_stat1 or the highest rowid without scanning
+        the table, or None for views and tables without rowid which have
+        no statistics. COUNT_DEFERRED mode returns remembered exact count
+        or None if it has not been computed yet.
+        Raises NotConnectedError if database is not connected.
+        
+        @mode -- COUNT_EXACT, COUNT_ESTIMATE or COUNT_DEFERRED, str
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self.database_name())
+            
+        if mode == COUNT_EXACT:
+            return self._exact_row_count()
+        elif mode == COUNT_ESTIMATE:
+            return self._estimated_row_count()
+        elif mode == COUNT_DEFERRED:
+            return self.database().cached_row_count(self.name())
+        else:
+            raise InvalidParameterError(mode, False)
+            
+    def _exact_row_count(self):
+        '''
+        Private: Counts rows with SELECT COUNT(*) and remembers the result.
+        '''
+        
+        try:
+            cur = self.connection().execute('SELECT COUNT(*) FROM ' + quote(self.name()))
+        except sl.OperationalError:
+            raise TableNotFoundError(self.name(), self.database_name())
+            
+        count = cur.fetchone()[0]
+        self.database().set_row_count(self.name(), count)
+        return count
+        
+    def _estimated_row_count(self):
+        '''
+        Private: Estimates number of rows from statistics gathered by
+        ANALYZE or from the highest rowid. Returns None if neither is
+        available, that is for views, tables without rowid and tables
+        whose columns hide all names of rowid.
+        '''
+        
+        count = self.database().cached_row_count(self.name())
+        if count is not None:
+            return count
+            
+        #Views have neither statistics nor rowid, max(rowid) would run them:
+        if self.database().catalog().kind(self.name()) == 'view':
+            return None
+            
+        #Partial index holds only some rows of the table:
+        try:
+            cur = self.connection().execute('SELECT stat FROM sqlite_stat1 WHERE tbl = ? AND '
+             '(idx IS NULL OR idx NOT IN (SELECT name FROM pragma_index_list(?) WHERE partial)) '
+             'ORDER BY idx IS NULL DESC', (self.name(), self.name()))
+            stat = cur.fetchone()
+        except sl.OperationalError:
+            stat = None
+            
+        if stat is not None and stat[0]:
+            try:
+                return int(stat[0].split()[0])
+            except ValueError:
+                pass
+                
+        #Column named rowid would be read instead of the real rowid:
+        key = self.row_key()
+        
+        if self.without_rowid() or len(key) == 0:
+            return None
+            
+        cur = self.connection().execute('SELECT max(' + quote(key[0]) + ') FROM ' + quote(self.name()))
+        count = cur.fetchone()[0]
+        
+        if count is None:
+            return 0
+        return count
         
     def primary_keys(self):
         '''
@@ -325,8 +1191,8 @@ class Table:
         meta = self.metadata()
         pks = []
         
-        for m in meta:
-            if m[5] == 1:
+        for m in sorted(meta, key=lambda m: m[5]):
+            if m[5] > 0:
                 pks.append(m[1])
                 
         return pks
@@ -345,45 +1211,241 @@ class Table:
                     pk_ids.append(m[0])
             
         return pk_ids
+        
+    def without_rowid(self):
+        '''
+        Returns True if table is declared WITHOUT ROWID, otherwise
+        returns False; False for views.
+        '''
+        
+        sql = self.database().catalog().sql(self.name())
+        
+        if sql is None or self.database().catalog().kind(self.name()) != 'table':
+            return False
+        return WITHOUT_ROWID.search(sql[sql.rfind(')') + 1:]) is not None
+        
+    def row_key(self):
+        '''
+        Returns names of columns identifying rows: name of rowid, see
+        ROWID_ALIASES, or primary keys for tables without rowid, which
+        are never NULL. Declared primary key of rowid table may hold NULL
+        values, rowid is always unique and not NULL. Returns empty list
+        for views and for tables whose columns hide all names of rowid.
+        '''
+        
+        if self.database().catalog().kind(self.name()) != 'table':
+            return []
+            
+        if self.without_rowid():
+            return self.primary_keys()
+            
+        names = self.column_names()
+        
+        for alias in ROWID_ALIASES:
+            if alias not in names:
+                return [alias]
+        return []
 
     def show_image(self, img_col, pk_vals):
         '''
-        Show image from column <img_col> identified by primary key
-        values <pk_vals>.
+        Returns content of column <img_col> in row identified by primary
+        key values <pk_vals>, or by row key values if table has no primary
+        key, see row_key(), as bytes, or None if the value is NULL. Use
+        open_blob() to read large values without loading them at once.
+        Raises RowNotFoundError if there is no such row.
+        Raises InvalidParameterError if the row can not be identified.
         Raises NotConnectedError if database is not connected.
         
         @img_col -- column with stored image, int
-        @pk_vals -- primary key values, list
+        @pk_vals -- primary key or row key values, list
         '''
         
-        if self.is_connected():
-            image_c = self.get_column_by_id(img_col)
-            pks = self.primary_keys()
-            pk_stmt = ""
+        if not self.is_connected():
+            raise NotConnectedError(self.database_name())
             
-            if len(pks) != len(pk_vals):
-                raise InvalidParameterError(pk_vals, False)
+        column = self.get_column_by_id(img_col)
+        where, params = self._pk_where(pk_vals)
+        rowid, kind = self._blob_row(column, where, params)
+        
+        if kind == 'null':
+            return None
             
-            if len(pks) == 1:
-                pk_stmt = "WHERE {0} = {1}".format(pks[0], pk_vals[0])
-            else:
-                pk_stmt = "WHERE "
-                for i in range(len(pks)):
-                    if i != len(pks) - 1:
-                        pk_stmt = pk_stmt + "{0} = {1} AND ".format(pks[i], pk_vals[i])
-                    else:
-                        pk_stmt = pk_stmt + "{0} = {1}".format(pks[i], pk_vals[i])
-                        
-            if pk_stmt != "":
-                stmt = "SELECT {0} FROM {1} {2}".format(image_c.name(), self.name(), pk_stmt)
-                cur = self.database().connection().execute(stmt)
-                img = cur.fetchone()[0]
-                return img
-            else:
-                raise GenericError("Could not create SQL statement.")
+        blob = self._open_blob(column, where, params, rowid)
+        
+        try:
+            return blob.read()
+        finally:
+            blob.close()
+            
+    def open_blob(self, col_id, pk_vals):
+        '''
+        Opens value of column <col_id> in row identified by primary key
+        values <pk_vals>, or by row key values if table has no primary key,
+        for reading. Returns read-only file-like object
+        supporting read(), seek(), tell(), len() and close(). Value is
+        read incrementally through Connection.blobopen() or, where it is
+        not available, in chunks of BLOB_CHUNK with substr().
+        Raises RowNotFoundError if there is no such row.
+        Raises InvalidParameterError if the row can not be identified.
+        Raises NotConnectedError if database is not connected.
+        
+        @col_id -- id of the column, int
+        @pk_vals -- primary key or row key values, list
+        '''
+        
+        if not self.is_connected():
+            raise NotConnectedError(self.database_name())
+            
+        column = self.get_column_by_id(col_id)
+        where, params = self._pk_where(pk_vals)
+        rowid, kind = self._blob_row(column, where, params)
         
+        return self._open_blob(column, where, params, rowid)
+        
+    def _blob_row(self, column, where, params):
+        '''
+        Private: Returns tuple (rowid, type of value of <column>) of the
+        row selected by <where>; rowid is None for tables without rowid,
+        views and tables whose columns hide all names of rowid.
+        typeof() does not read the value itself.
+        Raises RowNotFoundError if there is no such row.
+        '''
+        
+        source = ' FROM ' + quote(self.name()) + where
+        kind = 'typeof(' + quote(column.name()) + ')'
+        key = self.row_key()
+        
+        #Column named rowid would be selected instead of the real rowid:
+        if self.without_rowid() or len(key) == 0:
+            rowid = 'NULL'
         else:
+            rowid = quote(key[0])
+            
+        row = self.connection().execute('SELECT ' + rowid + ', ' + kind + source, params).fetchone()
+            
+        if row is None:
+            raise RowNotFoundError(params, self.name())
+            
+        return row
+        
+    def _open_blob(self, column, where, params, rowid):
+        '''
+        Private: Returns file-like reader of value of <column> in the row
+        selected by <where> with <rowid>, see open_blob().
+        '''
+        
+        if rowid is not None:
+            try:
+                return self.connection().blobopen(self.name(), column.name(), rowid, readonly=True)
+            except (AttributeError, sl.OperationalError):
+                #Older Python or value which is not BLOB nor TEXT:
+                pass
+                
+        return BlobReader(self, column.name(), where, params)
+        
+    def fetch_blobs(self, column, pk_tuples, chunk=500):
+        '''
+        Generator of values of <column> in rows identified by primary key
+        values from <pk_tuples>, or by row key values if table has no
+        primary key, see row_key(). Values of up to <chunk> rows are read
+        by one parameterized query and yielded as tuples (key values,
+        value) as they arrive. Keys without row are skipped.
+        Raises InvalidParameterError if table has neither primary key nor
+        row key.
+        Raises NotConnectedError if database is not connected.
+        
+        @column -- id or name of the column, int or str
+        @pk_tuples -- primary key or row key values of the rows, iterable of tuples
+        @chunk -- number of rows read by one query, int
+        '''
+        
+        if not self.is_connected():
             raise NotConnectedError(self.database_name())
+            
+        if type(column) == str:
+            column = self.get_column_by_name(column)
+        else:
+            column = self.get_column_by_id(column)
+            
+        pks = [quote(pk) for pk in self.primary_keys() or self.row_key()]
+        
+        if len(pks) == 0:
+            raise InvalidParameterError('primary key of ' + self.name(), False)
+            
+        if chunk < 1:
+            raise InvalidParameterError(chunk, False)
+            
+        chunk = max(1, min(chunk, MAX_VARIABLES // len(pks)))
+        
+        if len(pks) == 1:
+            key = pks[0]
+            marks = '?'
+        else:
+            key = '(' + ', '.join(pks) + ')'
+            marks = '(' + ', '.join(['?'] * len(pks)) + ')'
+            
+        select = 'SELECT ' + ', '.join(pks) + ', ' + quote(column.name())
+        select = select + ' FROM ' + quote(self.name()) + ' WHERE ' + key + ' IN '
+        
+        keys = []
+        
+        for pk_vals in pk_tuples:
+            if len(pk_vals) != len(pks):
+                raise InvalidParameterError(pk_vals, False)
+                
+            keys.append(pk_vals)
+            
+            if len(keys) == chunk:
+                for item in self._fetch_blob_chunk(select, marks, keys):
+                    yield item
+                keys = []
+                
+        if len(keys) > 0:
+            for item in self._fetch_blob_chunk(select, marks, keys):
+                yield item
+                
+    def _fetch_blob_chunk(self, select, marks, keys):
+        '''
+        Private: Runs query of fetch_blobs() for <keys> and yields
+        tuples (primary key values, value).
+        '''
+        
+        params = []
+        
+        for pk_vals in keys:
+            params.extend(pk_vals)
+            
+        if marks == '?':
+            stmt = select + '(' + ', '.join([marks] * len(keys)) + ')'
+        else:
+            stmt = select + '(VALUES ' + ', '.join([marks] * len(keys)) + ')'
+            
+        cur = self.connection().execute(stmt, params)
+        
+        try:
+            for row in cur:
+                yield (tuple(row[:-1]), row[-1])
+        finally:
+            cur.close()
+        
+    def _pk_where(self, pk_vals):
+        '''
+        Private: Returns tuple (WHERE clause, parameters) selecting row
+        with primary key values <pk_vals>, or row key values if table has
+        no primary key.
+        Raises InvalidParameterError if number of values does not match
+        number of key columns or there is no key.
+        
+        @pk_vals -- primary key or row key values, list
+        '''
+        
+        pks = self.primary_keys() or self.row_key()
+        
+        if len(pks) == 0 or len(pks) != len(pk_vals):
+            raise InvalidParameterError(pk_vals, False)
+            
+        where = ' WHERE ' + ' AND '.join([quote(pk) + ' = ?' for pk in pks])
+        return (where, list(pk_vals))
 
     def get_column_by_name(self, col_name):
         '''
@@ -393,11 +1455,11 @@ class Table:
         @col_name -- name of the column, str
         '''
 
-        cols = self.column_names()
+        meta = self.metadata()
 
-        for col in cols:
-            if col == col_name:
-                return Column(col_name, self)
+        for m in meta:
+            if m[1] == col_name:
+                return Column(col_name, self, m)
         raise ColumnNotFoundError("name", col_name, self.name())
 
     def get_column_by_id(self, col_id):
@@ -412,7 +1474,7 @@ class Table:
 
         for m in meta:
             if m[0] == col_id:
-                return Column(m[1], self)
+                return Column(m[1], self, m)
         raise ColumnNotFoundError("id", col_id, self.name())
 
     def get_columns(self):
@@ -425,28 +1487,49 @@ class Table:
 
         if len(meta) > 0:
             for m in meta:
-                cols.append(Column(m[1], self))
+                cols.append(Column(m[1], self, m))
             return cols
         else:
             return None
 
 class Column:
 
-    def __init__(self, col_name, table):
+    __slots__ = ('_name', '_table', '_id', '_data_type', '_not_null',
+                 '_default', '_pk')
+
+    def __init__(self, col_name, table, info=None):
         '''
         Creates an object representation of the column with
-        <col_name> from <table>.
+        <col_name> from <table>. Column is immutable, all its properties
+        are taken from <info> once at creation.
         
         @col_name -- name of the column, str
         @table -- table it belongs to, Table
+        @info -- row of PRAGMA table_info for the column, tuple; looked
+                 up in table's metadata if omitted
         '''
         
         if type(table) != Table or type(col_name) != str:
             raise InstanceCreationError(col_name)
+            
+        if info is None:
+            info = self._info_by_name(table, col_name)
 
-        self._name = col_name
-        self._table = table
-        self._id = self._id_by_name(col_name)
+        init = object.__setattr__
+        init(self, '_name', col_name)
+        init(self, '_table', table)
+        init(self, '_id', info[0])
+        init(self, '_data_type', info[2])
+        init(self, '_not_null', info[3] == 1)
+        init(self, '_default', info[4])
+        init(self, '_pk', info[5])
+        
+    def __setattr__(self, name, value):
+        '''
+        Column is immutable, any attribute assignment raises AttributeError.
+        '''
+        
+        raise AttributeError("Column \"{0}\" is immutable".format(self._name))
 
     def table(self):
         '''
@@ -496,12 +1579,7 @@ class Column:
         otherwise returns False.
         '''
         
-        meta = self.table().metadata()
-        
-        for m in meta:
-            if m[0] == self.id() and m[5] == 1:
-                return True
-        return False
+        return self._pk is not None and self._pk > 0
             
     def is_not_null(self):
         '''
@@ -509,47 +1587,1018 @@ class Column:
         otherwise returns False.
         '''
        
-        meta = self.table().metadata()
-        
-        for m in meta:
-            if m[0] == self.id() and m[3] == 1:
-                return True
-        return False     
+        return self._not_null
         
     def default_value(self):
         '''
         Returns default value for the column. 
         '''
         
-        meta = self.table().metadata()
-        
-        for m in meta:
-            if m[0] == self.id():
-                return m[4]
+        return self._default
             
     def data_type(self):
         '''
         Returns data type of the column. 
         '''
      
-        meta = self.table().metadata()
+        return self._data_type
+
+    def affinity(self):
+        '''
+        Returns type affinity of the column derived from its declared
+        type by SQLite rules: INTEGER, TEXT, BLOB, REAL or NUMERIC.
+        '''
         
-        for m in meta:
-            if m[0] == self.id():
-                return m[2]
+        decl = (self._data_type or '').upper()
+        
+        if 'INT' in decl:
+            return 'INTEGER'
+        elif 'CHAR' in decl or 'CLOB' in decl or 'TEXT' in decl:
+            return 'TEXT'
+        elif 'BLOB' in decl or decl == '':
+            return 'BLOB'
+        elif 'REAL' in decl or 'FLOA' in decl or 'DOUB' in decl:
+            return 'REAL'
+        else:
+            return 'NUMERIC'
 
-    def _id_by_name(self, col_name):
+    def _info_by_name(self, table, col_name):
         '''
-        Returns ID of the column <col_name>. Returns None if column
-        with specified name does not exists.
+        Private: Returns metadata row of the column <col_name> in <table>.
+        Returns row of None values if column with specified name does
+        not exists.
         
+        @table -- table the column belongs to, Table
         @col_name -- name of the column, str
         '''
-        
 
-        meta = self.table().metadata()
-        
-        for m in meta:
+        for m in table.metadata():
             if m[1] == col_name:
-                return m[0]
-        return None
+                return m
+        return (None, col_name, None, None, None, None)
+
+class EditSession:
+
+    def __init__(self, table):
+        '''
+        Creates buffer of changes of <table>. Cell edits and deletes are
+        keyed by primary key values. Nothing is written to the database
+        until commit(); rollback() just forgets the changes.
+        
+        @table -- edited table, Table
+        '''
+        
+        self._table = table
+        self._edits = OrderedDict()
+        self._deletes = OrderedDict()
+        self._inserts = []
+        self._pending = 0
+        
+    def table(self):
+        '''
+        Returns edited table.
+        '''
+        
+        return self._table
+        
+    def set_value(self, pk_vals, column, value):
+        '''
+        Buffers change of <column> to <value> in row identified by
+        primary key values <pk_vals>.
+        
+        @pk_vals -- primary key values, list
+        @column -- name of the column, str
+        @value -- new value
+        '''
+        
+        key = self._key(pk_vals)
+        self._table.get_column_by_name(column)
+        
+        if key in self._deletes:
+            raise RowNotFoundError(pk_vals, self._table.name())
+            
+        edit = self._edits.setdefault(key, OrderedDict())
+        
+        if column not in edit:
+            self._pending = self._pending + 1
+        edit[column] = value
+        
+    def has_value(self, pk_vals, column):
+        '''
+        Returns True if <column> of row <pk_vals> has buffered value,
+        otherwise returns False.
+        
+        @pk_vals -- primary key values, list
+        @column -- name of the column, str
+        '''
+        
+        edit = self._edits.get(tuple(pk_vals))
+        return edit is not None and column in edit
+        
+    def value(self, pk_vals, column, default=None):
+        '''
+        Returns buffered value of <column> of row <pk_vals>, <default>
+        if it is not changed.
+        
+        @pk_vals -- primary key values, list
+        @column -- name of the column, str
+        @default -- returned value of unchanged cell
+        '''
+        
+        edit = self._edits.get(tuple(pk_vals))
+        
+        if edit is None:
+            return default
+        return edit.get(column, default)
+        
+    def insert(self, values):
+        '''
+        Buffers insert of new row.
+        
+        @values -- values of the row by column name, dict
+        '''
+        
+        for column in values:
+            self._table.get_column_by_name(column)
+            
+        self._inserts.append(OrderedDict(values))
+        self._pending = self._pending + 1
+        
+    def delete(self, pk_vals):
+        '''
+        Buffers delete of row identified by <pk_vals>. Buffered edits
+        of the row are dropped.
+        
+        @pk_vals -- primary key values, list
+        '''
+        
+        key = self._key(pk_vals)
+        self._pending = self._pending - len(self._edits.pop(key, {}))
+        
+        if key not in self._deletes:
+            self._pending = self._pending + 1
+        self._deletes[key] = True
+        
+    def is_deleted(self, pk_vals):
+        '''
+        Returns True if row <pk_vals> is buffered for delete,
+        otherwise returns False.
+        
+        @pk_vals -- primary key values, list
+        '''
+        
+        return tuple(pk_vals) in self._deletes
+        
+    def pending(self):
+        '''
+        Returns number of buffered changes: changed cells, inserted
+        and deleted rows. It is counted as changes are buffered, so
+        asking costs nothing.
+        '''
+        
+        return self._pending
+        
+    def is_dirty(self):
+        '''
+        Returns True if there are buffered changes, otherwise returns False.
+        '''
+        
+        return self._pending > 0
+        
+    def commit(self):
+        '''
+        Writes buffered changes in one transaction: deletes, updates and
+        inserts, each grouped by changed columns into one executemany().
+        Buffer is emptied on success. On failure the transaction is rolled
+        back, changes stay buffered and GenericError is raised; it fails
+        also when a deleted or edited row is not found by its key, for
+        example when it was deleted by other connection meanwhile.
+        Raises NotConnectedError if database is not connected.
+        '''
+        
+        if not self._table.is_connected():
+            raise NotConnectedError(self._table.database_name())
+            
+        if not self.is_dirty():
+            return
+            
+        con = self._table.connection()
+        name = quote(self._table.name())
+        where = ' WHERE ' + ' AND '.join([quote(pk) + ' = ?' for pk in self._table.primary_keys()])
+        
+        updates = OrderedDict()
+        for key in self._edits:
+            edit = self._edits[key]
+            params = list(edit.values()) + list(key)
+            updates.setdefault(tuple(edit.keys()), []).append(params)
+            
+        inserts = OrderedDict()
+        for values in self._inserts:
+            inserts.setdefault(tuple(values.keys()), []).append(list(values.values()))
+            
+        try:
+            if not con.in_transaction:
+                con.execute('BEGIN')
+                
+            found = 0
+            
+            if len(self._deletes) > 0:
+                cur = con.executemany('DELETE FROM ' + name + where, [list(k) for k in self._deletes])
+                found = found + cur.rowcount
+                
+            for columns in updates:
+                sets = ', '.join([quote(c) + ' = ?' for c in columns])
+                cur = con.executemany('UPDATE ' + name + ' SET ' + sets + where, updates[columns])
+                found = found + cur.rowcount
+                
+            #Rowcount of executemany() is sum of rows changed by all parameters:
+            expected = len(self._deletes) + len(self._edits)
+            
+            if found != expected:
+                con.rollback()
+                raise GenericError("{0} of {1} changed rows of {2} not found, nothing committed.".format(
+                 expected - found, expected, self._table.name()))
+                
+            for columns in inserts:
+                cols = ', '.join([quote(c) for c in columns])
+                marks = ', '.join(['?'] * len(columns))
+                con.executemany('INSERT INTO ' + name + ' (' + cols + ') VALUES (' + marks + ')',
+                                inserts[columns])
+                
+            con.commit()
+        except sl.Error as er:
+            con.rollback()
+            raise GenericError(str(er))
+            
+        self.rollback()
+        
+    def rollback(self):
+        '''
+        Forgets buffered changes. Database is not touched.
+        '''
+        
+        self._edits = OrderedDict()
+        self._deletes = OrderedDict()
+        self._inserts = []
+        self._pending = 0
+        
+    def _key(self, pk_vals):
+        '''
+        Private: Returns <pk_vals> as tuple usable as dictionary key.
+        Raises InvalidParameterError if number of values does not match
+        number of primary key columns.
+        '''
+        
+        if len(pk_vals) == 0 or len(pk_vals) != len(self._table.primary_keys()):
+            raise InvalidParameterError(pk_vals, False)
+            
+        return tuple(pk_vals)
+
+class ColumnBuffer:
+
+    #Typecodes of array.array and types of values accepted for affinity;
+    #NUMERIC starts as integers and may switch to doubles, see extend():
+    TYPES = {'INTEGER': ('q', (int,)), 'REAL': ('d', (float, int)),
+             'NUMERIC': ('q', (int,))}
+    
+    #Integers up to this magnitude are stored exactly as doubles:
+    EXACT_DOUBLE = 2**53
+    
+    def __init__(self, affinity):
+        '''
+        Creates growing typed buffer of column values with NULL mask.
+        Buffer switches to object storage when a value does not fit
+        the type of <affinity>.
+        
+        @affinity -- affinity of the column, str
+        '''
+        
+        self._typecode, self._accepted = self.TYPES.get(affinity, (None, None))
+        self._numeric = affinity == 'NUMERIC'
+        self._exact = True
+        self._size = 0
+        self._np = _numpy()
+        
+        if self._np is not None:
+            if self._typecode is None:
+                dtype = object
+            else:
+                dtype = self._np.dtype(self._typecode)
+            self._values = self._np.empty(BATCH_SIZE, dtype=dtype)
+            self._mask = self._np.empty(BATCH_SIZE, dtype=bool)
+        else:
+            if self._typecode is None:
+                self._values = []
+            else:
+                self._values = array(self._typecode)
+            self._mask = array('B')
+            
+    def extend(self, values):
+        '''
+        Appends <values>; None is stored as 0 (or None) with mask set.
+        NUMERIC buffer holds integers until the first float, then it
+        switches to doubles if all its integers are exact as doubles.
+        
+        @values -- values of the column, sequence
+        '''
+        
+        mask = [v is None for v in values]
+        
+        if self._typecode is not None:
+            filled = []
+            for v in values:
+                if v is None:
+                    filled.append(0)
+                elif self._fits(v):
+                    filled.append(v)
+                    if type(v) == int and abs(v) > self.EXACT_DOUBLE:
+                        self._exact = False
+                elif self._numeric and self._typecode == 'q' and type(v) == float and self._exact:
+                    self._to_doubles()
+                    filled = [float(f) for f in filled]
+                    filled.append(v)
+                else:
+                    self._to_objects()
+                    break
+                    
+        if self._typecode is None:
+            filled = values
+            
+        if self._np is None:
+            self._values.extend(filled)
+            self._mask.extend(mask)
+            self._size = len(self._mask)
+            return
+            
+        end = self._size + len(mask)
+        
+        if end > len(self._values):
+            capacity = max(end, 2 * len(self._values))
+            self._values = self._grow(self._values, capacity)
+            self._mask = self._grow(self._mask, capacity)
+            
+        if self._typecode is None:
+            for i in range(len(filled)):
+                self._values[self._size + i] = filled[i]
+        else:
+            self._values[self._size:end] = filled
+        self._mask[self._size:end] = mask
+        self._size = end
+        
+    def result(self):
+        '''
+        Returns tuple (values, mask) trimmed to number of stored values.
+        '''
+        
+        if self._np is None:
+            return (self._values, self._mask)
+        return (self._values[:self._size].copy(), self._mask[:self._size].copy())
+        
+    def _fits(self, value):
+        '''
+        Private: Returns True if <value> is stored exactly by the buffer.
+        '''
+        
+        if type(value) not in self._accepted:
+            return False
+        if type(value) != int:
+            return True
+        if self._typecode == 'd':
+            return abs(value) <= self.EXACT_DOUBLE
+        return -2**63 <= value < 2**63
+        
+    def _to_doubles(self):
+        '''
+        Private: Switches integer buffer to doubles.
+        '''
+        
+        self._typecode = 'd'
+        self._accepted = (float, int)
+        
+        if self._np is None:
+            self._values = array('d', self._values)
+        else:
+            self._values = self._values.astype('d')
+            
+    def _to_objects(self):
+        '''
+        Private: Switches buffer to object storage.
+        '''
+        
+        self._typecode = None
+        
+        if self._np is None:
+            self._values = list(self._values)
+        else:
+            self._values = self._values.astype(object)
+            
+    def _grow(self, buf, capacity):
+        '''
+        Private: Returns copy of NumPy array <buf> with <capacity>.
+        '''
+        
+        grown = self._np.empty(capacity, dtype=buf.dtype)
+        grown[:self._size] = buf[:self._size]
+        return grown
+
+class BlobReader(io.RawIOBase):
+
+    def __init__(self, table, col_name, where, params):
+        '''
+        Creates file-like reader of value of column <col_name> in the row
+        of <table> selected by <where>. Value is read in chunks with
+        substr(), so it is never loaded whole.
+        Raises RowNotFoundError if there is no such row.
+        
+        @table -- table the value belongs to, Table
+        @col_name -- name of the column, str
+        @where -- WHERE clause selecting single row, str
+        @params -- parameters of <where>, list
+        '''
+        
+        super(BlobReader, self).__init__()
+        
+        self._connection = table.connection()
+        self._params = params
+        self._position = 0
+        
+        source = ' FROM ' + quote(table.name()) + where
+        cur = self._connection.execute('SELECT typeof(' + quote(col_name) + ')' + source, params)
+        row = cur.fetchone()
+        
+        if row is None:
+            raise RowNotFoundError(params, table.name())
+            
+        #substr() and length() count characters of TEXT, bytes of BLOB:
+        if row[0] == 'blob':
+            value = quote(col_name)
+        else:
+            value = 'CAST(' + quote(col_name) + ' AS BLOB)'
+            
+        cur = self._connection.execute('SELECT length(' + value + ')' + source, params)
+        self._size = cur.fetchone()[0] or 0
+        self._select = 'SELECT substr(' + value + ', ?, ?)' + source
+        
+    def __len__(self):
+        '''
+        Returns size of the value in bytes.
+        '''
+        
+        return self._size
+        
+    def readable(self):
+        '''
+        Reimplemented RawIOBase's readable.
+        '''
+        
+        return True
+        
+    def seekable(self):
+        '''
+        Reimplemented RawIOBase's seekable.
+        '''
+        
+        return True
+        
+    def tell(self):
+        '''
+        Returns current position in the value.
+        '''
+        
+        return self._position
+        
+    def seek(self, offset, whence=io.SEEK_SET):
+        '''
+        Moves current position to <offset> relative to <whence> and
+        returns the new position.
+        
+        @offset -- offset in bytes, int
+        @whence -- io.SEEK_SET, io.SEEK_CUR or io.SEEK_END, int
+        '''
+        
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise InvalidParameterError(whence, False)
+            
+        if position < 0:
+            raise InvalidParameterError(offset, False)
+            
+        self._position = position
+        return position
+        
+    def readinto(self, buf):
+        '''
+        Reimplemented RawIOBase's readinto. Reads at most BLOB_CHUNK
+        bytes into <buf> and returns their number.
+        
+        @buf -- writable buffer, bytearray or memoryview
+        '''
+        
+        count = min(len(buf), self._size - self._position, BLOB_CHUNK)
+        
+        if count <= 0:
+            return 0
+            
+        cur = self._connection.execute(self._select, [self._position + 1, count] + self._params)
+        data = cur.fetchone()[0]
+        buf[:len(data)] = data
+        self._position = self._position + len(data)
+        return len(data)
+        
+    def read(self, size=-1):
+        '''
+        Reads at most <size> bytes, everything to the end if <size>
+        is negative.
+        
+        @size -- number of bytes, int
+        '''
+        
+        if size is None or size < 0:
+            size = max(self._size - self._position, 0)
+            
+        buf = bytearray(min(size, max(self._size - self._position, 0)))
+        view = memoryview(buf)
+        done = 0
+        
+        while done < len(buf):
+            count = self.readinto(view[done:])
+            if count == 0:
+                break
+            done = done + count
+            
+        return bytes(view[:done])
+
+class ReadPool:
+
+    def __init__(self, path, max_size=POOL_SIZE, immutable=False, pragmas=None,
+                 profile=PROFILE_DEFAULT, stats=None):
+        '''
+        Creates pool of read-only connections to database at <path>.
+        Connections are opened when needed, up to <max_size>. Every
+        connection is a Database object which may be used by one thread
+        at a time and keeps its own schema cache.
+        
+        @path -- path to database file, str
+        @max_size -- maximal number of connections, int
+        @immutable -- open connections with immutable=1, bool
+        @pragmas -- PRAGMAs set on every new connection, dict
+        @profile -- connection profile, see Database.connect(), str
+        @stats -- statistics collected by all connections, Stats;
+                  not collected if None
+        '''
+        
+        if max_size < 1:
+            raise InvalidParameterError(max_size, False)
+            
+        if profile not in PROFILES:
+            raise InvalidParameterError(profile, False)
+            
+        self._path = path
+        self._max_size = max_size
+        self._immutable = immutable
+        self._pragmas = pragmas or {}
+        self._profile = profile
+        self._stats = stats
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._created = 0
+        self._closed = False
+        
+    def path(self):
+        '''
+        Returns path to the database file.
+        '''
+        
+        return self._path
+        
+    def max_size(self):
+        '''
+        Returns maximal number of connections.
+        '''
+        
+        return self._max_size
+        
+    def size(self):
+        '''
+        Returns number of open connections.
+        '''
+        
+        return self._created
+        
+    def share_stats(self, stats):
+        '''
+        Collects statement statistics of all connections, including
+        those in use, into <stats>; stops collecting if <stats> is None.
+        
+        @stats -- collected statistics, Stats
+        '''
+        
+        with self._lock:
+            self._stats = stats
+            for db in self._connections:
+                db.share_stats(stats)
+                
+    def checkout(self, timeout=None):
+        '''
+        Takes connected read-only Database from the pool. It must be
+        returned by checkin() when it is not needed anymore. Waits for
+        a free one if <max_size> connections are in use.
+        Raises PoolTimeoutError if none is free in <timeout> seconds.
+        
+        @timeout -- seconds to wait, float; wait forever if None
+        '''
+        
+        if self._closed:
+            raise NotConnectedError(self._path)
+            
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+            
+        with self._lock:
+            create = self._created < self._max_size
+            if create:
+                self._created = self._created + 1
+                
+        if create:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created = self._created - 1
+                raise
+                
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(self._path)
+            
+    def checkin(self, db):
+        '''
+        Returns Database taken by checkout() to the pool.
+        
+        @db -- database taken from this pool, Database
+        '''
+        
+        if self._closed:
+            db.disconnect()
+            with self._lock:
+                self._created = self._created - 1
+                self._connections.remove(db)
+        else:
+            self._idle.put(db)
+            
+    @contextmanager
+    def reader(self, timeout=None):
+        '''
+        Context manager taking Database from the pool and returning it
+        back when the block ends.
+        
+        @timeout -- seconds to wait, float; wait forever if None
+        '''
+        
+        db = self.checkout(timeout)
+        try:
+            yield db
+        finally:
+            self.checkin(db)
+            
+    def close(self):
+        '''
+        Disconnects idle connections. Connections in use are disconnected
+        when they are returned.
+        '''
+        
+        self._closed = True
+        
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            db.disconnect()
+            with self._lock:
+                self._created = self._created - 1
+                self._connections.remove(db)
+                
+    def _open(self):
+        '''
+        Private: Opens new read-only connection and sets its PRAGMAs.
+        '''
+        
+        db = Database()
+        options = {'read_only': True, 'check_same_thread': False}
+        
+        if self._immutable:
+            options['immutable'] = True
+            
+        db.connect(self._path, self._profile, **options)
+        
+        for name in self._pragmas:
+            db.set_pragma(name, self._pragmas[name])
+            
+        with self._lock:
+            db.share_stats(self._stats)
+            self._connections.append(db)
+            
+        return db
+
+class PooledCursor:
+
+    def __init__(self, pool, db, cursor):
+        '''
+        Wraps <cursor> of connection <db> taken from <pool>. Connections
+        of the pool do not check threads, so the cursor may be read in
+        other thread than the one which executed it, but only by one
+        thread at a time. Connection stays taken until close().
+        
+        @pool -- pool the connection was taken from, ReadPool
+        @db -- taken connection, Database
+        @cursor -- executed cursor of <db>, sqlite3.Cursor
+        '''
+        
+        self._pool = pool
+        self._db = db
+        self._cursor = cursor
+        
+    def fetchmany(self, size):
+        '''
+        Returns list of next <size> rows, empty list at the end.
+        Raises NotConnectedError if the cursor was closed.
+        
+        @size -- number of rows, int
+        '''
+        
+        if self._db is None:
+            raise NotConnectedError(self._pool.path())
+            
+        return self._cursor.fetchmany(size)
+        
+    def close(self):
+        '''
+        Closes the cursor and returns its connection to the pool.
+        '''
+        
+        if self._db is not None:
+            self._cursor.close()
+            self._pool.checkin(self._db)
+            self._db = None
+            
+    def __del__(self):
+        '''
+        Returns connection of cursor which was not closed.
+        '''
+        
+        self.close()
+
+class Stats:
+
+    def __init__(self, samples=STATS_SAMPLES):
+        '''
+        Creates empty statistics of executed statements. Statistics may
+        be shared by connections used from several threads. Totals count
+        every execution, p95 is computed from the latest <samples>
+        latencies of every statement.
+        
+        @samples -- number of kept latencies per statement, int
+        '''
+        
+        self._samples = samples
+        self._lock = threading.Lock()
+        self.reset()
+        
+    def reset(self):
+        '''
+        Drops collected statistics.
+        '''
+        
+        with self._lock:
+            self._traced = 0
+            self._statements = {}
+        
+    def traced(self, sql):
+        '''
+        Trace callback of the connection. Counts every statement SQLite
+        runs, including COMMIT and statements of triggers.
+        
+        @sql -- text of the statement, str
+        '''
+        
+        with self._lock:
+            self._traced = self._traced + 1
+        
+    def record(self, sql, seconds, rows):
+        '''
+        Records one execution of statement <sql>.
+        
+        @sql -- text of the statement, str
+        @seconds -- time spent executing and fetching, float
+        @rows -- number of returned rows, int
+        '''
+        
+        with self._lock:
+            entry = self._statements.get(sql)
+            
+            if entry is None:
+                entry = [0, 0, 0.0, deque(maxlen=self._samples)]
+                self._statements[sql] = entry
+                
+            entry[0] = entry[0] + 1
+            entry[1] = entry[1] + rows
+            entry[2] = entry[2] + seconds
+            entry[3].append(seconds)
+        
+    def summary(self):
+        '''
+        Returns dictionary with number of traced statements (traced),
+        number of executions through execute() (count), total and
+        95th percentile latency in seconds (time, p95), returned rows
+        (rows) and list of the same values for every distinct statement
+        ordered by total time (statements).
+        '''
+        
+        statements = []
+        samples = []
+        
+        with self._lock:
+            traced = self._traced
+            
+            for sql in self._statements:
+                count, rows, seconds, latencies = self._statements[sql]
+                samples.extend(latencies)
+                statements.append({'sql': sql, 'count': count, 'rows': rows,
+                                   'time': seconds, 'p95': _p95(latencies)})
+                
+        statements.sort(key=lambda st: st['time'], reverse=True)
+        
+        return {'traced': traced, 'count': sum([st['count'] for st in statements]),
+                'rows': sum([st['rows'] for st in statements]),
+                'time': sum([st['time'] for st in statements]), 'p95': _p95(samples),
+                'statements': statements}
+
+def _p95(values):
+    '''
+    Returns 95th percentile of <values> or 0.0 for no values.
+    
+    @values -- measured values, iterable(float)
+    '''
+    
+    if len(values) == 0:
+        return 0.0
+        
+    ordered = sorted(values)
+    return ordered[int(math.ceil(0.95 * len(ordered))) - 1]
+
+class StatsConnection(sl.Connection):
+    '''
+    Connection measuring statements executed by execute() and
+    executemany() when its <stats> are set.
+    '''
+    
+    stats = None
+    
+    def execute(self, sql, parameters=()):
+        '''
+        Reimplemented Connection's execute.
+        '''
+        
+        if self.stats is None:
+            return super(StatsConnection, self).execute(sql, parameters)
+            
+        cur = self.cursor(StatsCursor)
+        cur.start(self.stats, sql)
+        cur.execute(sql, parameters)
+        cur.pause()
+        return cur
+        
+    def executemany(self, sql, parameters):
+        '''
+        Reimplemented Connection's executemany.
+        '''
+        
+        if self.stats is None:
+            return super(StatsConnection, self).executemany(sql, parameters)
+            
+        cur = self.cursor(StatsCursor)
+        cur.start(self.stats, sql)
+        cur.executemany(sql, parameters)
+        cur.pause()
+        return cur
+
+class StatsCursor(sl.Cursor):
+    '''
+    Cursor adding time spent fetching and number of fetched rows to the
+    execution of its statement. Execution is recorded when all rows are
+    fetched or cursor is closed.
+    '''
+    
+    _stats = None
+    
+    def start(self, stats, sql):
+        '''
+        Starts measuring execution of <sql>.
+        '''
+        
+        self._stats = stats
+        self._sql = sql
+        self._rows = 0
+        self._seconds = 0.0
+        self._started = time.perf_counter()
+        
+    def pause(self):
+        '''
+        Adds time since start or last fetch to the execution.
+        '''
+        
+        self._seconds = self._seconds + time.perf_counter() - self._started
+        
+    def finish(self):
+        '''
+        Records the execution, only once.
+        '''
+        
+        if self._stats is not None:
+            self._stats.record(self._sql, self._seconds, self._rows)
+            self._stats = None
+            
+    def _fetched(self, rows, done):
+        '''
+        Private: Accounts <rows> fetched since self._started.
+        '''
+        
+        if self._stats is not None:
+            self.pause()
+            self._rows = self._rows + rows
+            if done:
+                self.finish()
+                
+    def fetchone(self):
+        '''
+        Reimplemented Cursor's fetchone.
+        '''
+        
+        self._started = time.perf_counter()
+        row = super(StatsCursor, self).fetchone()
+        self._fetched(int(row is not None), row is None)
+        return row
+        
+    def fetchmany(self, size=None):
+        '''
+        Reimplemented Cursor's fetchmany.
+        '''
+        
+        if size is None:
+            size = self.arraysize
+            
+        self._started = time.perf_counter()
+        rows = super(StatsCursor, self).fetchmany(size)
+        self._fetched(len(rows), len(rows) < size)
+        return rows
+        
+    def fetchall(self):
+        '''
+        Reimplemented Cursor's fetchall.
+        '''
+        
+        self._started = time.perf_counter()
+        rows = super(StatsCursor, self).fetchall()
+        self._fetched(len(rows), True)
+        return rows
+        
+    def __next__(self):
+        '''
+        Reimplemented Cursor's iteration.
+        '''
+        
+        self._started = time.perf_counter()
+        
+        try:
+            row = super(StatsCursor, self).__next__()
+        except StopIteration:
+            self._fetched(0, True)
+            raise
+            
+        self._fetched(1, False)
+        return row
+        
+    def close(self):
+        '''
+        Reimplemented Cursor's close.
+        '''
+        
+        self.finish()
+        super(StatsCursor, self).close()
+        
+    def __del__(self):
+        '''
+        Records execution of cursor which was not read to the end.
+        '''
+        
+        self.finish()
@@ -76,3 +76,21 @@ class ColumnNotFoundError(Exception):
     def __str__(self):
         return self.msg
      
+
+class PoolTimeoutError(Exception):
+    '''No pooled connection became free in time.'''
+    
+    def __init__(self, db_name):
+        self.msg = "No free read connection of {0}".format(db_name)
+        
+    def __str__(self):
+        return self.msg
+
+class RowNotFoundError(Exception):
+    '''Row with specified primary key does not exist.'''
+    
+    def __init__(self, pk_vals, tname):
+        self.msg = "Row with primary key {0} could not be found in \"{1}\".".format(pk_vals, tname)
+        
+    def __str__(self):
+        return self.msg
@@ -0,0 +1,155 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import shutil
+import json
+import base64
+from database import *
+
+#Export formats:
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+
+#Ways of exporting BLOB values:
+BLOB_BASE64 = 'base64'
+BLOB_FILES = 'files'
+
+#Size of write buffer of exported file in bytes:
+EXPORT_BUFFER = 1024 * 1024
+
+def export_format(path):
+    '''
+    Returns export format guessed from extension of <path>;
+    FORMAT_CSV for unknown extensions.
+
+    @path -- path to exported file, str
+    '''
+
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return FORMAT_JSONL
+    return FORMAT_CSV
+
+def export_table(table, path, fmt=None, blobs=BLOB_BASE64, batch_size=BATCH_SIZE,
+                 progress=None, cancelled=None):
+    '''
+    Streams rows of <table> to CSV or JSON Lines file at <path>. Rows
+    are read in batches of <batch_size> and written through buffered
+    file, so memory use does not depend on size of the table.
+    BLOB values are written base64 encoded, or each into its own file in
+    directory <path>_blobs with relative path of the file written instead.
+    Returns number of written rows, or None if export was cancelled.
+    Incomplete file and its BLOB directory are removed when export is
+    cancelled or fails.
+    Raises NotConnectedError if database is not connected.
+
+    @table -- exported table, Table
+    @path -- path to exported file, str
+    @fmt -- FORMAT_CSV or FORMAT_JSONL, str; guessed from <path> if None
+    @blobs -- BLOB_BASE64 or BLOB_FILES, str
+    @batch_size -- number of rows read at once, int
+    @progress -- called with (written rows, estimated total) after every
+                 batch; total is written rows if it can not be estimated,
+                 callable
+    @cancelled -- called after every batch, export stops if it returns
+                  True, callable
+    '''
+
+    if fmt is None:
+        fmt = export_format(path)
+
+    if fmt not in (FORMAT_CSV, FORMAT_JSONL):
+        raise InvalidParameterError(fmt, False)
+
+    if blobs not in (BLOB_BASE64, BLOB_FILES):
+        raise InvalidParameterError(blobs, False)
+
+    names = table.column_names()
+    total = table.row_count(COUNT_ESTIMATE) or 0
+    blob_dir = path + '_blobs'
+    written = 0
+
+    try:
+        with open(path, 'w', encoding='utf-8', newline='', buffering=EXPORT_BUFFER) as out:
+            if fmt == FORMAT_CSV:
+                writer = csv.writer(out)
+                writer.writerow(names)
+
+            for batch in table.iter_rows(batch_size, batches=True):
+                lines = []
+
+                for row in batch:
+                    if any([type(v) == bytes for v in row]):
+                        row = [_blob_value(v, blobs, blob_dir, written + len(lines), names[i])
+                               for i, v in enumerate(row)]
+
+                    if fmt == FORMAT_CSV:
+                        lines.append(row)
+                    else:
+                        lines.append(json.dumps(dict(zip(names, row)), ensure_ascii=False))
+
+                if fmt == FORMAT_CSV:
+                    writer.writerows(lines)
+                else:
+                    out.write('\n'.join(lines))
+                    out.write('\n')
+
+                written = written + len(batch)
+
+                if progress is not None:
+                    progress(written, max(total, written))
+
+                if cancelled is not None and cancelled():
+                    break
+            else:
+                return written
+    except BaseException:
+        _remove_export(path, blob_dir)
+        raise
+
+    _remove_export(path, blob_dir)
+    return None
+
+def _remove_export(path, blob_dir):
+    '''
+    Private: Removes incomplete exported file <path> and directory
+    <blob_dir> of its BLOB files.
+    '''
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    if os.path.isdir(blob_dir):
+        shutil.rmtree(blob_dir)
+
+def _blob_value(value, blobs, blob_dir, row, column):
+    '''
+    Private: Returns exported form of <value>. BLOBs are base64 encoded
+    or written to a file in <blob_dir>, other values are kept.
+
+    @value -- exported value
+    @blobs -- BLOB_BASE64 or BLOB_FILES, str
+    @blob_dir -- directory of BLOB files, str
+    @row -- index of the row in exported file, int
+    @column -- name of the column, str
+    '''
+
+    if type(value) != bytes:
+        return value
+
+    if blobs == BLOB_BASE64:
+        return base64.b64encode(value).decode('ascii')
+
+    if not os.path.isdir(blob_dir):
+        os.makedirs(blob_dir)
+
+    safe = ''.join([ch if ch.isalnum() else '_' for ch in column])
+    name = '{0}_{1}.bin'.format(row, safe)
+
+    with open(os.path.join(blob_dir, name), 'wb') as f:
+        f.write(value)
+
+    return os.path.join(os.path.basename(blob_dir), name)
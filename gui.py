@@ -1,17 +1,26 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
+import os
+from collections import OrderedDict
 from PySide import QtGui, QtCore
 from database import *
+from workers import *
+from thumbnails import *
 
 TIMEOUT = 2000
 MAX = 400
+FETCH = 256
+#Directory of on-disk thumbnail cache, None keeps thumbnails only in memory:
+THUMBNAIL_DIR = None
 
 class PictureDialog(QtGui.QDialog):
 
-    def __init__(self, img):
+    def __init__(self, image):
         '''
         Constructs dialog.
+        
+        @image -- image already scaled to fit into MAX x MAX, QtGui.QImage
         '''
         
         super(PictureDialog, self).__init__()
@@ -22,48 +31,425 @@ class PictureDialog(QtGui.QDialog):
         
         self._layout = QtGui.QHBoxLayout(self)
         
-        self._pixmap = QtGui.QPixmap()
-        
         self._label = QtGui.QLabel(self)
         self._label.setSizePolicy(QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Expanding)
 
-        self.scale_image(img)
+        self.show_image(image)
         
         self._layout.addWidget(self._label)
         self.setLayout(self._layout)
         
         self.show()
         
-    def scale_image(self, img):
+    def show_image(self, image):
         '''
-        Scales loaded image.
+        Shows <image> and fits dialog to its size.
+        
+        @image -- shown image, QtGui.QImage
         '''
     
-        self._pixmap.loadFromData(img)
-        sizes = self._pixmap.size()
-        pm = None
-        
-        if sizes.height() > MAX and sizes.width() > MAX:
-            wx = float(sizes.width()) / float(MAX)
-            hx = float(sizes.height()) / float(MAX)
-            pm = self._pixmap.scaled(int(sizes.width() / wx),
-             int(sizes.height() / hx), QtCore.Qt.KeepAspectRatio)
-            
-        elif sizes.height() > MAX and sizes.width() < MAX:
-            hx = float(sizes.height()) / float(MAX)
-            pm = self._pixmap.scaled(int(sizes.width() / hx),
-             int(sizes.height() / hx), QtCore.Qt.KeepAspectRatio)
-            
-        elif sizes.height() < MAX and sizes.width() > MAX:
-            wx = float(sizes.width()) / float(MAX)
-            pm = self._pixmap.scaled(int(sizes.width() / wx),
-             int(sizes.height() / wx), QtCore.Qt.KeepAspectRatio)
+        pm = QtGui.QPixmap.fromImage(image)
+        self.setFixedSize(pm.size().width(), pm.size().height())
+        self._label.setPixmap(pm)
+
+class SearchDialog(QtGui.QDialog):
+    
+    #Emitted with (database path, table name) when hit is activated:
+    hit_activated = QtCore.Signal(str, str)
+    
+    def __init__(self, search, parent=None):
+        '''
+        Constructs dialog searching all open databases as user types.
+        
+        @search -- returns hits of text, see search.search_all(), callable
+        @parent -- parent widget, QtGui.QWidget
+        '''
+        
+        super(SearchDialog, self).__init__(parent)
+        
+        self._search = search
+        
+        self.setWindowTitle("SQLookup Search")
+        self.setWindowIcon(QtGui.QIcon('icons/app_icon.png'))
+        self.resize(700, 350)
+        
+        self._layout = QtGui.QVBoxLayout(self)
+        
+        self._edit = QtGui.QLineEdit(self)
+        self._edit.setPlaceholderText('Search text columns of open databases')
+        self._edit.textChanged.connect(self._text_changed)
+        
+        self._hits = QtGui.QTreeWidget(self)
+        self._hits.setRootIsDecorated(False)
+        self._hits.setUniformRowHeights(True)
+        self._hits.setHeaderLabels(['Database', 'Table', 'Key', 'Column', 'Text'])
+        self._hits.itemActivated.connect(self._item_activated)
+        
+        self._layout.addWidget(self._edit)
+        self._layout.addWidget(self._hits)
+        self.setLayout(self._layout)
+        
+    def refresh(self):
+        '''
+        Searches current text again.
+        '''
+        
+        self._text_changed(self._edit.text())
+        
+    def _text_changed(self, text):
+        '''
+        Shows hits of <text>.
+        
+        @text -- searched text, str
+        '''
+        
+        self._hits.clear()
+        
+        try:
+            hits = self._search(text)
+        except GenericError as er:
+            self.setWindowTitle("SQLookup Search - {0}".format(er))
+            return
+            
+        self.setWindowTitle("SQLookup Search")
+        
+        for db_path, table, pk, column, snippet in hits:
+            item = QtGui.QTreeWidgetItem([os.path.basename(db_path), table,
+             ', '.join([str(v) for v in pk]), column, snippet])
+            item.setData(0, QtCore.Qt.UserRole, db_path)
+            self._hits.addTopLevelItem(item)
+            
+    def _item_activated(self, item, column):
+        '''
+        Emits hit_activated for activated <item>.
+        '''
+        
+        self.hit_activated.emit(item.data(0, QtCore.Qt.UserRole), item.text(1))
+
+class TableModel(QtCore.QAbstractTableModel):
+
+    def __init__(self, table, parent=None, rows=None, last=None):
+        '''
+        Constructs model of <table>'s content. Rows are fetched from the
+        database in pages of FETCH when view asks for them. Cells of
+        tables with primary key are editable; changes are buffered in
+        edit session until commit(). Filtered and sorted rows are read
+        by LoadTableJob, see set_query().
+        
+        @table -- shown table, Table
+        @parent -- parent object, QtCore.QObject
+        @rows -- already fetched first page with row keys, see Table.page(), list
+        @last -- key of the last row of <rows>, tuple
+        '''
+        
+        super(TableModel, self).__init__(parent)
+        
+        self._table = table
+        self._columns = table.get_columns() or []
+        self._blobs = [c.data_type() == "BLOB" for c in self._columns]
+        self._pk_ids = table.primary_keys_ids()
+        self._session = table.edit_session()
+        self._rows = []
+        self._row_keys = []
+        self._key_size = len(table.row_key())
+        self._last = None
+        self._batches = None
+        self._cursor = None
+        self._exhausted = False
+        self._where = None
+        self._order_by = None
+        
+        if rows is not None:
+            self._add_rows(rows, True)
+            self._last = last
+            self._exhausted = len(rows) < FETCH
+        
+    def table(self):
+        '''
+        Returns shown table.
+        '''
+        
+        return self._table
+        
+    def session(self):
+        '''
+        Returns edit session buffering changes of the table.
+        '''
+        
+        return self._session
+        
+    def commit(self):
+        '''
+        Writes buffered changes to the database. Reading of further rows
+        stops, so its connection does not lock the file; shown rows are
+        not read again, see set_query().
+        Raises GenericError if changes could not be written.
+        '''
+        
+        if self._cursor is not None or self._batches is not None:
+            self.close()
+            self._exhausted = True
+            
+        self._session.commit()
+        
+    def close(self):
+        '''
+        Stops reading rows of the query and returns its connection to
+        the pool.
+        '''
+        
+        if self._batches is not None:
+            self._batches.close()
+            self._batches = None
+            
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        
+    def where(self):
+        '''
+        Returns filter of shown rows, SQL expression or None.
+        '''
+        
+        return self._where
+        
+    def order_by(self):
+        '''
+        Returns sort order of shown rows, see set_query(), or None.
+        '''
+        
+        return self._order_by
+        
+    def set_query(self, where, order_by, rows, last=None, cursor=None):
+        '''
+        Shows rows matching <where> in <order_by> order, first page of
+        them read by LoadTableJob. Further rows are read from <cursor>,
+        or by row key after <last> if neither filter nor sort order
+        is set.
+        
+        @where -- SQL expression of WHERE clause, str
+        @order_by -- column names or tuples (column name, descending), list
+        @rows -- first page of the rows, list; None if table can not be
+                 paged; rows start with row keys without filter and sort order
+        @last -- key of the last row of <rows>, tuple
+        @cursor -- cursor reading further rows, PooledCursor
+        '''
+        
+        self.beginResetModel()
+        self.close()
+        self._where = where
+        self._order_by = order_by
+        self._rows = []
+        self._row_keys = []
+        self._add_rows(rows or [], where is None and order_by is None)
+        self._last = last
+        self._cursor = cursor
+        self._exhausted = rows is not None and len(rows) < FETCH
+        self.endResetModel()
+        
+    def rollback(self):
+        '''
+        Forgets buffered changes and shows original values.
+        '''
+        
+        self._session.rollback()
+        
+        if len(self._rows) > 0:
+            self.dataChanged.emit(self.index(0, 0),
+             self.index(len(self._rows) - 1, len(self._columns) - 1))
+        
+    def total_rows(self):
+        '''
+        Returns number of rows in the table without fetching them. Exact
+        count is used when it is already known, estimate otherwise; None
+        if neither is known, see Table.row_count().
+        '''
+        
+        count = self._table.row_count(COUNT_DEFERRED)
+        
+        if count is None:
+            count = self._table.row_count(COUNT_ESTIMATE)
+        return count
+        
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        '''
+        Reimplemented Qt's rowCount. Returns number of fetched rows.
+        '''
+        
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+        
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        '''
+        Reimplemented Qt's columnCount.
+        '''
+        
+        return len(self._columns)
+        
+    def canFetchMore(self, parent):
+        '''
+        Reimplemented Qt's canFetchMore. Returns True until all rows
+        of the table are fetched.
+        '''
+        
+        if parent.isValid():
+            return False
+        return not self._exhausted
+        
+    def fetchMore(self, parent):
+        '''
+        Reimplemented Qt's fetchMore. Fetches next page of rows. Views
+        and tables without row key are read sequentially.
+        '''
+        
+        if parent.isValid() or self._exhausted:
+            return
+            
+        if self._cursor is not None:
+            batch = self._cursor.fetchmany(FETCH)
+        elif self._batches is None:
+            try:
+                batch, self._last = self._table.page(self._last, FETCH, with_keys=True)
+            except TableNotFoundError:
+                self._batches = self._table.iter_rows(FETCH, batches=True)
+                
+        if self._batches is not None:
+            batch = next(self._batches, [])
+            
+        keyed = self._cursor is None and self._batches is None
+        
+        if len(batch) < FETCH:
+            self._exhausted = True
+            self.close()
+            
+        if len(batch) == 0:
+            return
+            
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(batch) - 1)
+        self._add_rows(batch, keyed)
+        self.endInsertRows()
+        
+    def row_key(self, row):
+        '''
+        Returns row key values of row number <row>, see Table.row_key();
+        None if they were not read, that is for filtered or sorted rows
+        and for tables without row key.
+        
+        @row -- number of the row, int
+        '''
+        
+        return self._row_keys[row]
+        
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        '''
+        Reimplemented Qt's data. Display text is created on demand,
+        BLOBs are shown as <BLOB>. Buffered changes are shown instead of
+        stored values. UserRole returns raw stored value.
+        '''
+        
+        if not index.isValid():
+            return None
+            
+        row = self._rows[index.row()]
+        
+        if role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole:
+            if self._blobs[index.column()]:
+                return "<BLOB>"
+                
+            value = row[index.column()]
             
+            if self._session.is_dirty():
+                value = self._session.value(self._key(row), self._columns[index.column()].name(), value)
+                
+            if role == QtCore.Qt.EditRole and value is None:
+                return ""
+            return str(value)
+        elif role == QtCore.Qt.UserRole:
+            return row[index.column()]
+            
+        return None
+        
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        '''
+        Reimplemented Qt's setData. Buffers new value of the cell
+        converted by column's affinity.
+        '''
+        
+        if not index.isValid() or role != QtCore.Qt.EditRole:
+            return False
+            
+        column = self._columns[index.column()]
+        self._session.set_value(self._key(self._rows[index.row()]), column.name(),
+         self._convert(value, column))
+        self.dataChanged.emit(index, index)
+        return True
+        
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        '''
+        Reimplemented Qt's headerData. Returns column names.
+        '''
+        
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self._columns[section].name()
+        return None
+        
+    def flags(self, index):
+        '''
+        Reimplemented Qt's flags. Cells of BLOB columns and of tables
+        without primary key are read-only.
+        '''
+        
+        flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+        
+        if index.isValid() and len(self._pk_ids) > 0 and not self._blobs[index.column()]:
+            flags = flags | QtCore.Qt.ItemIsEditable
+        return flags
+        
+    def _add_rows(self, rows, keyed):
+        '''
+        Private: Appends <rows>; row key values are split from the rows
+        if they are <keyed>, see Table.page().
+        '''
+        
+        if keyed and self._key_size > 0:
+            self._rows.extend([row[self._key_size:] for row in rows])
+            self._row_keys.extend([list(row[:self._key_size]) for row in rows])
         else:
-            pm = self._pixmap 
+            self._rows.extend(rows)
+            self._row_keys.extend([None] * len(rows))
         
-        self.setFixedSize(pm.size().width(), pm.size().height())
-        self._label.setPixmap(pm)
+    def _key(self, row):
+        '''
+        Private: Returns primary key values of <row>.
+        '''
+        
+        return [row[i] for i in self._pk_ids]
+        
+    def _convert(self, value, column):
+        '''
+        Private: Converts edited text <value> to type of <column>'s
+        affinity. Empty text is NULL for numeric columns.
+        '''
+        
+        affinity = column.affinity()
+        
+        if affinity == 'TEXT' or affinity == 'BLOB':
+            return value
+            
+        if value == "":
+            return None
+            
+        for cast in (int, float):
+            if affinity == 'REAL' and cast == int:
+                continue
+            try:
+                return cast(value)
+            except ValueError:
+                pass
+                
+        return value
 
 class SQLookup(QtGui.QMainWindow):
     
@@ -74,8 +460,20 @@ class SQLookup(QtGui.QMainWindow):
         
         super(SQLookup, self).__init__()
         self._build_ui()
-        self._databases = []
-        self._acive_table = None
+        #Open databases keyed by path, in order of opening:
+        self._databases = OrderedDict()
+        self._db_items = {}
+        self._active_table = None
+        self._loading = None
+        self._querying = None
+        self._count_items = {}
+        self._counting = set()
+        self._jobs = []
+        self._pool = QtCore.QThreadPool(self)
+        self._thumbnails = ThumbnailCache(directory=THUMBNAIL_DIR)
+        self._indexes = {}
+        self._index_versions = {}
+        self._search_dialog = None
         
     def _build_ui(self):
         '''
@@ -92,15 +490,39 @@ class SQLookup(QtGui.QMainWindow):
         self._statusbar = QtGui.QStatusBar(self)
         self._create_actions()
         
+        #SQL statistics shown when enabled in Application menu:
+        self._stats_label = QtGui.QLabel(self)
+        self._stats_label.hide()
+        self._statusbar.addPermanentWidget(self._stats_label)
+        self._stats_timer = QtCore.QTimer(self)
+        self._stats_timer.setInterval(1000)
+        self._stats_timer.timeout.connect(self._update_stats)
+        
         self._table_view = QtGui.QTreeView(self)
         self._table_view.setMinimumSize(150, 150)
         
         self._editor_view = QtGui.QTreeView(self)
         self._editor_view.setMinimumSize(250, 150)
+        self._editor_view.setRootIsDecorated(False)
+        self._editor_view.setUniformRowHeights(True)
+        self._editor_view.header().setClickable(True)
+        self._editor_view.header().setSortIndicatorShown(False)
+        self._editor_view.header().sectionClicked.connect(self._header_clicked)
+        
+        #Filter of editor view; WHERE expression evaluated by SQLite:
+        self._filter_edit = QtGui.QLineEdit(self)
+        self._filter_edit.setPlaceholderText('Filter, e.g. price > 10 AND name LIKE \'a%\'')
+        self._filter_edit.returnPressed.connect(self._filter_changed)
+        
+        self._editor_panel = QtGui.QWidget(self)
+        layout = QtGui.QVBoxLayout(self._editor_panel)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._filter_edit)
+        layout.addWidget(self._editor_view)
 
         self._splitter = QtGui.QSplitter(QtCore.Qt.Horizontal)        
         self._splitter.addWidget(self._table_view)
-        self._splitter.addWidget(self._editor_view)
+        self._splitter.addWidget(self._editor_panel)
         self._splitter.setChildrenCollapsible(False)
         self._splitter.moveSplitter(260, 0)
         
@@ -117,6 +539,14 @@ class SQLookup(QtGui.QMainWindow):
         self._table_view.setColumnWidth(2, 45)
         self._table_view.setColumnHidden(3, True)
         self._table_view.activated.connect(self.on_table_activated)
+        self._table_view.expanded.connect(self._database_expanded)
+        self._table_view.verticalScrollBar().valueChanged.connect(self._schedule_counts)
+        
+        #Rows of visible tables are counted shortly after view stops moving:
+        self._count_timer = QtCore.QTimer(self)
+        self._count_timer.setSingleShot(True)
+        self._count_timer.setInterval(100)
+        self._count_timer.timeout.connect(self._count_visible)
         
         self._editor_model = None
         
@@ -138,20 +568,39 @@ class SQLookup(QtGui.QMainWindow):
         self._open_db.triggered.connect(self._open_db_clicked)
         
         self._new_db = QtGui.QAction(QtGui.QIcon('icons/db_new.png'), 'New DB', self)
-        #self._new_db.setShortcut('Ctrl+N')
-        #self._new_db.triggered.connect() #TODO: Slot implementation
+        self._new_db.setShortcut('Ctrl+N')
+        self._new_db.triggered.connect(self._new_db_clicked)
         
         self._close_db = QtGui.QAction(QtGui.QIcon('icons/db_close.png'), 'Close DB', self)
         self._close_db.setShortcut('Ctrl+Q')
         self._close_db.triggered.connect(self._close_db_clicked)
         
         self._commit_db = QtGui.QAction(QtGui.QIcon('icons/db_commit.png'), 'Commit', self)
-        #self._commit_db.setShortcut('Ctrl+S')
-        #self._commit_db.triggered.connect() #TODO: Slot implementation
+        self._commit_db.setShortcut('Ctrl+S')
+        self._commit_db.triggered.connect(self._commit_clicked)
         
         self._rollback_db = QtGui.QAction(QtGui.QIcon('icons/db_rollback.png'), 'Rollback', self)
-        #self._rollback_db.setShortcut('Ctrl+Z')
-        #self._rollback_db.triggered.connect() #TODO: Slot implementation
+        self._rollback_db.setShortcut('Ctrl+Z')
+        self._rollback_db.triggered.connect(self._rollback_clicked)
+        
+        self._export_table = QtGui.QAction(QtGui.QIcon('icons/table_export.png'), 'Export', self)
+        self._export_table.setShortcut('Ctrl+E')
+        self._export_table.triggered.connect(self._export_clicked)
+        
+        self._search = QtGui.QAction(QtGui.QIcon('icons/search.png'), 'Search', self)
+        self._search.setShortcut('Ctrl+F')
+        self._search.triggered.connect(self._search_clicked)
+        
+        self._rebuild_index = QtGui.QAction('Rebuild index', self)
+        self._rebuild_index.triggered.connect(self._rebuild_index_clicked)
+        
+        self._cancel = QtGui.QAction(QtGui.QIcon('icons/cancel.png'), 'Cancel', self)
+        self._cancel.setShortcut('Esc')
+        self._cancel.triggered.connect(self._cancel_clicked)
+        
+        self._sql_stats = QtGui.QAction('SQL statistics', self)
+        self._sql_stats.setCheckable(True)
+        self._sql_stats.toggled.connect(self._sql_stats_toggled)
         
         self._quit = QtGui.QAction(QtGui.QIcon('icons/quit.png'), 'Quit', self)
         self._quit.setShortcut('Ctrl+X')
@@ -170,6 +619,9 @@ class SQLookup(QtGui.QMainWindow):
         self._toolbar.addAction(self._close_db)
         self._toolbar.addAction(self._commit_db)
         self._toolbar.addAction(self._rollback_db)
+        self._toolbar.addAction(self._export_table)
+        self._toolbar.addAction(self._search)
+        self._toolbar.addAction(self._cancel)
         #self.tool_bar.addAction(self._quit)
         
     def _build_menubar(self):
@@ -178,6 +630,7 @@ class SQLookup(QtGui.QMainWindow):
         '''
         
         self._menu_application = self._menubar.addMenu('&Application')
+        self._menu_application.addAction(self._sql_stats)
         self._menu_application.addAction(self._quit)
         
         self._menu_database = self._menubar.addMenu('&Database')
@@ -186,6 +639,10 @@ class SQLookup(QtGui.QMainWindow):
         self._menu_database.addAction(self._close_db)
         self._menu_database.addAction(self._commit_db)
         self._menu_database.addAction(self._rollback_db)
+        self._menu_database.addAction(self._export_table)
+        self._menu_database.addAction(self._search)
+        self._menu_database.addAction(self._rebuild_index)
+        self._menu_database.addAction(self._cancel)
         
     def db_count(self):
         '''
@@ -210,34 +667,37 @@ class SQLookup(QtGui.QMainWindow):
                 
     def remove_database(self, db_path):
         '''
-        Disconnects and closes selected database.
+        Disconnects and closes selected database. Editor view showing
+        its table is removed first, so rows are not read anymore.
         
         @db_path -- path to the database, str
         '''
         
-        if self.db_count() == 0:
+        db = self._databases.pop(db_path, None)
+        
+        if db is None:
             return
-        else:
-            for i in range(self.db_count()):
-                if self._databases[i].path() == db_path:
-                    self._databases[i].disconnect()
-                    del self._databases[i]
-                    return
-                    
+            
+        self.remove_editor_view(db_path)
+        self.cancel_jobs(db_path)
+        if db_path in self._indexes:
+            self._indexes.pop(db_path).close()
+        self._index_versions.pop(db_path, None)
+        db.disconnect()
+        self._db_items.pop(db_path, None)
+        self._count_items = dict([(k, v) for k, v in self._count_items.items() if k[0] != db_path])
+        self._counting = set([k for k in self._counting if k[0] != db_path])
+        
     def get_database(self, db_path):
         '''
-        Gets database with <db_path> from list of opened databases.
+        Gets database with <db_path> from opened databases; None if it
+        is not open.
         
         @db_path -- path to the database, str
         '''
         
-        if self.db_count() == 0:
-            return None
-        else:
-            for db in self._databases:
-                if db.path() == db_path:
-                    return db
-                    
+        return self._databases.get(db_path)
+        
     def remove_editor_view(self, db_path):
         '''
         Removes editor's view if database of shown table is closed.
@@ -246,8 +706,15 @@ class SQLookup(QtGui.QMainWindow):
         @db_path - path to the database, str
         '''
 
-        if self._active_table.database_path() == db_path:
+        if self._active_table is not None and self._active_table.database_path() == db_path:
                 self._editor_view.setModel(self._empty_model)
+                if self._editor_model is not None:
+                    self._editor_model.close()
+                self._editor_model = None
+                self._querying = None
+                self._active_table = None
+                self._editor_view.header().setSortIndicatorShown(False)
+                self._filter_edit.clear()
                 
     def closeEvent(self, event):
         '''
@@ -257,66 +724,650 @@ class SQLookup(QtGui.QMainWindow):
         @event -- close event, QtGui.QCloseEvent
         '''
         
+        self.cancel_jobs()
+        self._pool.waitForDone()
+        
+        if self._editor_model is not None:
+            self._editor_model.close()
+        
+        for index in self._indexes.values():
+            index.close()
+        
         if self.db_count() > 0:
-            for db in self._databases:
+            for db in self._databases.values():
                 print("Disconnecting {0}...".format(db.name()))
                 db.disconnect()
                 print("Done")
                 
         
+    def start_job(self, job):
+        '''
+        Runs <job> in the thread pool. Progress and failures of the job
+        are shown in status bar.
+        
+        @job -- job to run, Job
+        '''
+        
+        job.signals.progress.connect(self._job_progress)
+        job.signals.failed.connect(self._job_failed)
+        job.signals.finished.connect(self._job_finished)
+        self._jobs.append(job)
+        self._pool.start(job)
+        
+    def cancel_jobs(self, db_path=None, kinds=None):
+        '''
+        Cancels running jobs of database with <db_path>.
+        
+        @db_path -- path to the database, str; all jobs if None
+        @kinds -- classes of cancelled jobs, tuple; all if None
+        '''
+        
+        for job in self._jobs:
+            if kinds is not None and not isinstance(job, kinds):
+                continue
+                
+            if db_path is None or job.path() == db_path:
+                job.cancel()
+                
+                #Cancelled indexing is resumed by the next update:
+                if isinstance(job, IndexJob):
+                    self._index_versions.pop(job.path(), None)
+                    
+                #Tables left uncounted are counted when visible again:
+                if isinstance(job, RowCountJob):
+                    self._counting = set([k for k in self._counting if k[0] != job.path() or
+                                          self._count_items[k].text() != ''])
+                
+    def _cancel_clicked(self):
+        '''
+        Cancels all running jobs.
+        '''
+        
+        if len(self._jobs) > 0:
+            self.cancel_jobs()
+            self._statusbar.showMessage("Cancelled.", TIMEOUT)
+            
+    def _job_progress(self, db_path, done, total):
+        '''
+        Shows progress of a job in status bar.
+        '''
+        
+        self._statusbar.showMessage("{0}: {1}/{2}".format(db_path, done, total), TIMEOUT)
+        
+    def _job_failed(self, db_path, msg):
+        '''
+        Shows error of a job in status bar.
+        '''
+        
+        self._statusbar.showMessage(msg, TIMEOUT)
+        
+    def _job_finished(self, job):
+        '''
+        Forgets finished job.
+        '''
+        
+        if job in self._jobs:
+            self._jobs.remove(job)
+            
+    def _new_db_clicked(self):
+        '''
+        Creates database from CSV or JSON Lines file. Import runs in
+        background and the database is opened when it is finished.
+        '''
+        
+        source, tmp = QtGui.QFileDialog.getOpenFileName(self, 'Import data', '',
+         'CSV (*.csv);;JSON Lines (*.jsonl)')
+         
+        if source == "":
+            return
+            
+        fname, tmp = QtGui.QFileDialog.getSaveFileName(self, 'New database', '',
+         'SQLite database (*.db *.sqlite)')
+         
+        if fname == "":
+            return
+            
+        if self.get_database(fname) is not None or self._is_opening(fname):
+            self._statusbar.showMessage("Can't import into opened database.", TIMEOUT)
+            return
+            
+        job = ImportJob(fname, source)
+        job.signals.result.connect(self._database_imported)
+        self.start_job(job)
+        
+    def _database_imported(self, db_path, rows):
+        '''
+        Opens database created by ImportJob.
+        
+        @db_path -- path to the database, str
+        @rows -- number of imported rows, int; None if cancelled
+        '''
+        
+        if rows is None:
+            return
+            
+        self._statusbar.showMessage("Imported {0} rows.".format(rows), TIMEOUT)
+        
+        if self.get_database(db_path) is None and not self._is_opening(db_path):
+            job = OpenDatabaseJob(db_path)
+            job.signals.result.connect(self._database_loaded)
+            self.start_job(job)
+        
+    def _commit_clicked(self):
+        '''
+        Writes changes made in editor view to the database. Background
+        jobs reading the database which are restarted when needed are
+        cancelled first; commit waits for running export and import.
+        '''
+        
+        model = self._editor_model
+        
+        if model is None or not model.session().is_dirty():
+            self._statusbar.showMessage("Nothing to commit.", TIMEOUT)
+            return
+            
+        pending = model.session().pending()
+        db_path = model.table().database_path()
+        
+        #Export and import would lose their work if cancelled:
+        for job in self._jobs:
+            if isinstance(job, (ExportJob, ImportJob)) and job.path() == db_path:
+                self._statusbar.showMessage("Wait for export or import of {0} to finish.".format(
+                 db_path), TIMEOUT)
+                return
+                
+        #Readers of the database holding SHARED lock would block the write
+        #on the GUI thread until busy timeout; they are restarted when needed:
+        self.cancel_jobs(db_path, (LoadTableJob, RowCountJob, IndexJob))
+        
+        try:
+            model.commit()
+        except GenericError as er:
+            self._statusbar.showMessage(str(er), TIMEOUT)
+        else:
+            self._statusbar.showMessage("Committed {0} changes.".format(pending), TIMEOUT)
+            
+            #Edited rows may lie below high-water mark of the search index,
+            #commit of this connection does not change its data version:
+            index = self._indexes.get(db_path)
+            
+            if index is not None:
+                index.invalidate(model.table().name())
+                self._index_versions.pop(db_path, None)
+            
+        #Rows not read before commit are read again:
+        self._query_editor(model.where(), model.order_by())
+            
+    def _rollback_clicked(self):
+        '''
+        Discards changes made in editor view.
+        '''
+        
+        model = self._editor_model
+        
+        if model is not None and model.session().is_dirty():
+            model.rollback()
+            self._statusbar.showMessage("Changes discarded.", TIMEOUT)
+            
+    def _header_clicked(self, section):
+        '''
+        Sorts editor view by clicked column; clicking the same column
+        again reverses the order.
+        
+        @section -- index of the column, int
+        '''
+        
+        model = self._editor_model
+        header = self._editor_view.header()
+        
+        if model is None:
+            return
+            
+        descending = header.isSortIndicatorShown() and header.sortIndicatorSection() == section \
+         and header.sortIndicatorOrder() == QtCore.Qt.AscendingOrder
+        name = model.headerData(section, QtCore.Qt.Horizontal)
+        
+        self._query_editor(model.where(), [(name, descending)])
+            
+    def _filter_changed(self):
+        '''
+        Applies filter of editor view; empty filter shows all rows.
+        '''
+        
+        model = self._editor_model
+        
+        if model is None:
+            return
+            
+        where = self._filter_edit.text().strip() or None
+        self._query_editor(where, model.order_by())
+        
+    def _query_editor(self, where, order_by):
+        '''
+        Reads rows of editor view matching <where> in <order_by> order
+        in background, see TableModel.set_query().
+        
+        @where -- SQL expression of WHERE clause, str
+        @order_by -- tuples (column name, descending), list
+        '''
+        
+        table = self._editor_model.table()
+        db_path = table.database_path()
+        pool = self.get_database(db_path).read_pool()
+        
+        if pool is None and (where is not None or order_by is not None):
+            self._statusbar.showMessage("Database {0} can not be queried.".format(db_path), TIMEOUT)
+            return
+            
+        self._querying = (db_path, table.name(), where, order_by)
+        
+        job = LoadTableJob(db_path, table.name(), FETCH, pool, where, order_by)
+        job.signals.result.connect(self._query_loaded)
+        job.signals.failed.connect(self._query_failed)
+        self.start_job(job)
+        
+    def _query_loaded(self, db_path, page):
+        '''
+        Shows rows read by LoadTableJob started by _query_editor().
+        Result is dropped if other query was started in the meantime.
+        
+        @db_path -- path to the database, str
+        @page -- result of LoadTableJob, tuple
+        '''
+        
+        table_name, where, order_by, rows, last, cursor = page
+        
+        if self._querying != (db_path, table_name, where, order_by):
+            if cursor is not None:
+                cursor.close()
+            return
+            
+        self._querying = None
+        self._editor_model.set_query(where, order_by, rows, last, cursor)
+        header = self._editor_view.header()
+        
+        if order_by is None:
+            header.setSortIndicatorShown(False)
+        else:
+            name, descending = order_by[0]
+            section = [c.name() for c in self._editor_model.table().get_columns()].index(name)
+            header.setSortIndicatorShown(True)
+            header.setSortIndicator(section, QtCore.Qt.DescendingOrder if descending else
+                                    QtCore.Qt.AscendingOrder)
+                                    
+    def _query_failed(self, db_path, message):
+        '''
+        Forgets failed query started by _query_editor(), shown rows stay.
+        Error is shown by _job_failed().
+        
+        @db_path -- path to the database, str
+        @message -- error message, str
+        '''
+        
+        if self._querying is not None and self._querying[0] == db_path:
+            self._querying = None
+            
+    def _update_index(self, db_path, rebuild=False):
+        '''
+        Indexes rows added to the database since its last indexing in
+        background. Nothing is started if data of the database did not
+        change since then, unless index is built again from scratch.
+        
+        @db_path -- path to the database, str
+        @rebuild -- index all rows again, bool
+        '''
+        
+        db = self.get_database(db_path)
+        
+        if db is None:
+            return
+            
+        index = self._indexes.get(db_path)
+        
+        if index is None:
+            try:
+                index = SearchIndex(db_path)
+            except GenericError as er:
+                self._statusbar.showMessage("Search index not available: {0}".format(er), TIMEOUT)
+                return
+            self._indexes[db_path] = index
+            
+        version = db.data_version()
+        
+        if self._index_versions.get(db_path) == version and not rebuild:
+            return
+            
+        self._index_versions[db_path] = version
+        job = IndexJob(db_path, index, db.read_pool(), rebuild)
+        job.signals.result.connect(self._index_updated)
+        job.signals.failed.connect(self._index_failed)
+        self.start_job(job)
+        
+    def _index_updated(self, db_path, indexed):
+        '''
+        Searches again when new values were indexed.
+        
+        @db_path -- path to the database, str
+        @indexed -- number of indexed values, int
+        '''
+        
+        if indexed > 0 and self._search_dialog is not None and self._search_dialog.isVisible():
+            self._search_dialog.refresh()
+            
+    def _index_failed(self, db_path, msg):
+        '''
+        Lets the next update index the database again.
+        
+        @db_path -- path to the database, str
+        @msg -- error message, str
+        '''
+        
+        self._index_versions.pop(db_path, None)
+        
+    def _rebuild_index_clicked(self):
+        '''
+        Builds search indexes of all open databases again in background,
+        so rows changed in place or removed by other programs are found.
+        Running index updates are cancelled first.
+        '''
+        
+        for job in self._jobs:
+            if isinstance(job, IndexJob):
+                job.cancel()
+                
+        for db_path in self._databases:
+            self._update_index(db_path, True)
+            
+        self._statusbar.showMessage("Rebuilding search index.", TIMEOUT)
+        
+    def _search_clicked(self):
+        '''
+        Shows search dialog. Indexes of changed databases are updated
+        in background, hits are refreshed when they are done.
+        '''
+        
+        for db_path in self._databases:
+            self._update_index(db_path)
+            
+        if self._search_dialog is None:
+            self._search_dialog = SearchDialog(self.search, self)
+            self._search_dialog.hit_activated.connect(self._hit_activated)
+            
+        self._search_dialog.show()
+        self._search_dialog.raise_()
+        self._search_dialog.activateWindow()
+        
+    def search(self, text):
+        '''
+        Returns hits of <text> in all open databases, see
+        search.search_all().
+        
+        @text -- searched text, str
+        '''
+        
+        indexes = [self._indexes[p] for p in self._databases if p in self._indexes]
+        return search_all(indexes, text)
+        
+    def _hit_activated(self, db_path, table_name):
+        '''
+        Shows table of activated search hit in editor view.
+        
+        @db_path -- path to the database, str
+        @table_name -- name of the table, str
+        '''
+        
+        self._populate(db_path)
+        item = self._count_items.get((db_path, table_name))
+        
+        if item is not None:
+            index = self._table_model.indexFromItem(item)
+            index = index.sibling(index.row(), 0)
+            self._table_view.setExpanded(index.parent(), True)
+            self._table_view.setCurrentIndex(index)
+            self.on_table_activated(index)
+            
+    def _export_clicked(self):
+        '''
+        Exports table shown in editor view to CSV or JSON Lines file.
+        Export runs in background and may be cancelled.
+        '''
+        
+        table = self._active_table
+        
+        if table is None or self.get_database(table.database_path()) is None:
+            self._statusbar.showMessage("Can't export. No table opened.", TIMEOUT)
+            return
+            
+        fname, tmp = QtGui.QFileDialog.getSaveFileName(self, 'Export table', table.name() + '.csv',
+         'CSV (*.csv);;JSON Lines (*.jsonl)')
+         
+        if fname == "":
+            return
+            
+        job = ExportJob(table.database_path(), table.name(), fname,
+         pool=table.database().read_pool())
+        job.signals.result.connect(self._table_exported)
+        self.start_job(job)
+        
+    def _table_exported(self, db_path, result):
+        '''
+        Reports finished export.
+        
+        @db_path -- path to the database, str
+        @result -- tuple (exported file, written rows), tuple
+        '''
+        
+        target, rows = result
+        
+        if rows is not None:
+            self._statusbar.showMessage("Exported {0} rows to {1}.".format(rows, target), TIMEOUT)
+        
+    def _sql_stats_toggled(self, checked):
+        '''
+        Turns collecting and showing of SQL statistics on or off.
+        
+        @checked -- show statistics, bool
+        '''
+        
+        for db in self._databases.values():
+            db.enable_stats(checked)
+            
+        if checked:
+            self._update_stats()
+            self._stats_label.show()
+            self._stats_timer.start()
+        else:
+            self._stats_timer.stop()
+            self._stats_label.hide()
+            
+    def _update_stats(self):
+        '''
+        Shows SQL statistics of open databases, including their read
+        pools, in status bar. Tooltip lists the slowest statements.
+        '''
+        
+        count = 0
+        seconds = 0.0
+        lines = []
+        
+        for db in self._databases.values():
+            stats = db.stats()
+            if stats is None:
+                continue
+                
+            count = count + stats['count']
+            seconds = seconds + stats['time']
+            lines.append("{0}: {1} statements, {2:.1f} ms, p95 {3:.2f} ms".format(db.name(),
+             stats['count'], stats['time'] * 1000, stats['p95'] * 1000))
+             
+            for st in stats['statements'][:10]:
+                lines.append("  {0} x {1:.1f} ms  {2}".format(st['count'], st['time'] * 1000, st['sql']))
+                
+        self._stats_label.setText("SQL: {0} statements, {1:.1f} ms".format(count, seconds * 1000))
+        self._stats_label.setToolTip("\n".join(lines))
+        
+    def _is_opening(self, db_path):
+        '''
+        Returns True if database with <db_path> is being opened,
+        otherwise returns False.
+        
+        @db_path -- path to the database, str
+        '''
+        
+        for job in self._jobs:
+            if type(job) == OpenDatabaseJob and job.path() == db_path and not job.is_cancelled():
+                return True
+        return False
+        
     def _open_db_clicked(self):
         '''
-        Opens and connects database. Lists all the table in database.
+        Opens selected databases. Tables of every database are listed
+        by a background job.
         '''
     
-        fname, tmp = QtGui.QFileDialog.getOpenFileName(self, 'Open database', '/home/daniel/Dokumenty/Python/SQLite Lookup')
+        fnames, tmp = QtGui.QFileDialog.getOpenFileNames(self, 'Open database', '/home/daniel/Dokumenty/Python/SQLite Lookup')
 
-        cur = self.db_count()
-        db_opened = False
+        for fname in fnames:
+            if self.get_database(fname) is not None or self._is_opening(fname):
+                self._statusbar.showMessage("Database with same name already opened.", TIMEOUT)
+            else:
+                job = OpenDatabaseJob(fname)
+                job.signals.result.connect(self._database_loaded)
+                self.start_job(job)
+                
+    def _database_loaded(self, db_path, tables):
+        '''
+        Connects database checked by OpenDatabaseJob and adds its node
+        to table view. Tables are listed when the node is expanded.
         
-        if fname == "":
+        @db_path -- path to the database, str
+        @tables -- names of the tables, list(str)
+        '''
+        
+        db = Database()
+        
+        try:
+            db.connect(db_path)
+        except ConnectionError as er:
+            self._statusbar.showMessage(str(er), TIMEOUT)
             return
+            
+        self._databases[db_path] = db
+        db.enable_stats(self._sql_stats.isChecked())
         
-        if cur > 0:
-            for db in self._databases:
-                if fname == db.path():
-                    db_opened = True
-
-        if not db_opened:
-            self._databases.append(Database())
+        try:
+            db.open_read_pool(profile=PROFILE_BROWSE)
+        except ConnectionError:
+            pass
+        
+        item = QtGui.QStandardItem(db.name())
+        params = [item ,QtGui.QStandardItem(''),QtGui.QStandardItem(''), QtGui.QStandardItem(db_path)]
+        self.set_editable(params, False)
+        self._table_model.appendRow(params)
+        self._db_items[db_path] = item
+        
+        #Placeholder makes the node expandable until tables are listed:
+        if len(tables) > 0:
+            placeholder = QtGui.QStandardItem('...')
+            placeholder.setEditable(False)
+            item.appendRow(placeholder)
             
-            try:
-                self._databases[cur].connect(fname)
-            except ConnectionError as er:
-                self._statusbar.showMesage(str(er), TIMEOUT)
-                del self._databases[cur]
-            else: 
-                try:
-                    tables = self._databases[cur].table_names()
-                except InvalidFileError as er:
-                    self._statusbar.showMessage(str(er), TIMEOUT)
-                    del self._databases[cur]
-                else:
-                    item = QtGui.QStandardItem(self._databases[cur].name())
-                    params = [item ,QtGui.QStandardItem(''),QtGui.QStandardItem(''), QtGui.QStandardItem(fname)]
-                    self.set_editable(params, False)
-                    self._table_model.appendRow(params)
-                    tables = self._databases[cur].table_names()
-                    
-                    for t in tables:
-                        tbl = self._databases[cur].get_table(t)
-                        params = []
-                        params.append(QtGui.QStandardItem(tbl.name()))
-                        params.append(QtGui.QStandardItem(str(tbl.row_count())))
-                        params.append(QtGui.QStandardItem(str(tbl.column_count())))
-                        self.set_editable(params, False)
-                        item.appendRow(params)
+    def _database_expanded(self, index):
+        '''
+        Lists tables of expanded database node.
+        
+        @index -- index of the node, QtGui.QModelIndex
+        '''
+        
+        if index.parent().isValid():
+            return
+            
+        self._populate(str(self._table_model.data(index.sibling(index.row(), 3))))
+        self._schedule_counts()
+        
+    def _populate(self, db_path):
+        '''
+        Replaces placeholder of database node with its tables, once.
+        Counts are filled in later by _count_visible().
+        
+        @db_path -- path to the database, str
+        '''
+        
+        db = self.get_database(db_path)
+        item = self._db_items.get(db_path)
+        
+        if db is None or item is None or (item.rowCount() > 0 and item.child(0, 1) is not None):
+            return
+            
+        try:
+            names = db.table_names()
+        except (InvalidFileError, NotConnectedError) as er:
+            self._statusbar.showMessage(str(er), TIMEOUT)
+            return
+            
+        item.removeRows(0, item.rowCount())
+        
+        for name in names:
+            count = db.cached_row_count(name)
+            params = []
+            params.append(QtGui.QStandardItem(name))
+            params.append(QtGui.QStandardItem('' if count is None else str(count)))
+            params.append(QtGui.QStandardItem(''))
+            self.set_editable(params, False)
+            item.appendRow(params)
+            self._count_items[(db_path, name)] = params[1]
+            
+    def _schedule_counts(self, *args):
+        '''
+        Counts rows of visible tables once table view stops moving.
+        '''
+        
+        self._count_timer.start()
+        
+    def _count_visible(self):
+        '''
+        Starts RowCountJob for visible tables not counted yet, one job
+        per database.
+        '''
+        
+        view = self._table_view
+        index = view.indexAt(QtCore.QPoint(0, 0))
+        bottom = view.viewport().height()
+        pending = OrderedDict()
+        
+        while index.isValid() and view.visualRect(index).top() < bottom:
+            parent = index.parent()
+            
+            if parent.isValid():
+                db_path = str(self._table_model.data(parent.sibling(parent.row(), 3)))
+                key = (db_path, str(self._table_model.data(index.sibling(index.row(), 0))))
+                
+                if key in self._count_items and key not in self._counting:
+                    self._counting.add(key)
+                    pending.setdefault(db_path, []).append(key[1])
                     
-                    #Set item as expanded when loaded:    
-                    index = self._table_model.indexFromItem(item)
-                    self._table_view.setExpanded(index, True)
-        else:
-            self._statusbar.showMessage("Database with same name already opened.", TIMEOUT)
+            index = view.indexBelow(index)
+            
+        for db_path, names in pending.items():
+            job = RowCountJob(db_path, names, self.get_database(db_path).read_pool())
+            job.signals.partial.connect(self._row_count_loaded)
+            self.start_job(job)
+            
+    def _row_count_loaded(self, db_path, count):
+        '''
+        Shows row and column count computed by RowCountJob.
+        
+        @db_path -- path to the database, str
+        @count -- tuple (table name, row count, column count), tuple
+        '''
+        
+        name, rows, cols = count
+        item = self._count_items.get((db_path, name))
+        
+        if item is not None:
+            item.setText(str(rows))
+            item.parent().child(item.row(), 2).setText(str(cols))
+            self.get_database(db_path).set_row_count(name, rows)
         
     def _close_db_clicked(self):
         '''
@@ -345,8 +1396,6 @@ class SQLookup(QtGui.QMainWindow):
                 self.remove_database(db_path)
                 model.removeRow(current.row())
                 
-            self.remove_editor_view(db_path)
-                
             self._statusbar.showMessage("Database {0} sucessfully closed.".format(db_name), TIMEOUT)
             
     def on_table_activated(self, index):
@@ -358,7 +1407,6 @@ class SQLookup(QtGui.QMainWindow):
         
         model = self._table_view.model()
         db_path = ""
-        db = None
         
         #If user did not clicked 1st column:
         sibling = index.sibling(index.row(), 0)
@@ -369,37 +1417,58 @@ class SQLookup(QtGui.QMainWindow):
         
         #Do something only if table is activated, do nothing otherwise:
         if parent.isValid():
-            self._editor_model = None
             db_path = str(model.data(parent.sibling(parent.row(), 3)))
             db = self.get_database(db_path)
-            table = db.get_table(str(model.data(index)))
+            self._loading = (db_path, str(model.data(index)))
+            
+            #First page is read in background:
+            job = LoadTableJob(db_path, self._loading[1], FETCH, db.read_pool())
+            job.signals.result.connect(self._table_loaded)
+            self.start_job(job)
+            
+    def _table_loaded(self, db_path, page):
+        '''
+        Shows table loaded by LoadTableJob in editor view. Result is
+        ignored if other table was activated in the meantime.
+        
+        @db_path -- path to the database, str
+        @page -- result of LoadTableJob, tuple
+        '''
+        
+        table_name, where, order_by, rows, last, cursor = page
+        
+        if self._loading != (db_path, table_name):
+            return
+            
+        self._loading = None
+        self._querying = None
+        db = self.get_database(db_path)
+        
+        if db is not None:
+            if self._editor_model is not None and self._editor_model.session().is_dirty():
+                self._statusbar.showMessage("Uncommitted changes of {0} discarded.".format(
+                 self._editor_model.table().name()), TIMEOUT)
+                 
+            if self._editor_model is not None:
+                self._editor_model.close()
+            self._editor_model = None
+            table = db.get_table(table_name)
             
-            #Set up editor view and model:
+            #Set up editor view and model, other rows are fetched as view scrolls:
             cols = table.column_count()
             if cols > 0:
-                self._editor_model = QtGui.QStandardItemModel(0, cols, self)
-                col_names = table.column_names()
-                self._editor_model.setHorizontalHeaderLabels(col_names)
+                self._editor_model = TableModel(table, self, rows, last)
                 self._editor_view.setModel(self._editor_model)
+                self._editor_view.header().setSortIndicatorShown(False)
+                self._filter_edit.clear()
                 self._active_table = table
                 
                 for i in range(cols):
                     self._editor_view.setColumnWidth(i, 125)
-                
-                #Load rows:
-                rows = table.rows()
-                for row in rows:
-                    params = []
                     
-                    for r in range(len(row)):
-                        clmn = table.get_column_by_id(r)
-                        if clmn.data_type() == "BLOB":
-                            params.append(QtGui.QStandardItem("<BLOB>"))
-                        else:
-                            params.append(QtGui.QStandardItem(str(row[r])))
-                        
-                    self.set_editable(params, False)                        
-                    self._editor_model.appendRow(params)
+                total = self._editor_model.total_rows()
+                if total is not None:
+                    self._statusbar.showMessage("{0}: {1} rows".format(table.name(), total), TIMEOUT)
                     
     def on_row_item_activated(self, index):
         '''
@@ -424,13 +1493,36 @@ class SQLookup(QtGui.QMainWindow):
                 for pk_id in table.primary_keys_ids():
                     sblng = index.sibling(index.row(), pk_id)
                     if sblng.isValid():
-                        pk_vals.append(model.data(sblng))
+                        pk_vals.append(model.data(sblng, QtCore.Qt.UserRole))
                     else:
                         all_ok = False
                         break
                         
-                if all_ok:                
-                    img = table.show_image(index.column(), pk_vals)
+                #Rows of table without primary key are identified by rowid:
+                if len(pks) == 0:
+                    pk_vals = model.row_key(index.row())
+                    
+                    if pk_vals is None:
+                        self._statusbar.showMessage("Row of {0} can not be identified.".format(
+                         table.name()), TIMEOUT)
+                        return
+                        
+                if all_ok:
+                    key = self._thumbnails.key(table, index.column(), pk_vals)
+                    img = self._thumbnails.get(key)
+                    
+                    if img is None:
+                        try:
+                            img = decode_scaled(table.open_blob(index.column(), pk_vals), MAX)
+                        except (RowNotFoundError, InvalidParameterError) as er:
+                            self._statusbar.showMessage(str(er), TIMEOUT)
+                            return
+                            
+                        if img.isNull():
+                            self._statusbar.showMessage("Could not decode image.", TIMEOUT)
+                            return
+                        self._thumbnails.put(key, img)
+                        
                     dialog = PictureDialog(img) 
                     
                     result = dialog.exec()                   
@@ -0,0 +1,318 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import csv
+import json
+import sqlite3 as sl
+from itertools import chain, islice
+from database import *
+from export import FORMAT_CSV, FORMAT_JSONL, export_format
+
+#Number of records used to infer column types:
+SAMPLE = 1000
+
+#Rows inserted by one executemany():
+INSERT_BATCH = 10000
+
+#Rows inserted in one transaction:
+TRANSACTION_ROWS = 1000000
+
+#Plain decimal numbers; no digit separators or non-ASCII digits. Integer
+#part with leading zero, like zip code 00042, would lose it as number:
+INTEGER_TEXT = re.compile(r'^[+-]?(0|[1-9][0-9]*)$')
+REAL_TEXT = re.compile(r'^[+-]?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?$')
+
+#Range of SQLite INTEGER; larger integers, like 20 digit IDs, are TEXT
+#since REAL would not keep all their digits:
+INTEGER_MIN = -2**63
+INTEGER_MAX = 2**63 - 1
+
+#PRAGMAs set for the time of import; restored afterwards:
+LOAD_PRAGMAS = [('journal_mode', 'MEMORY'), ('synchronous', 'OFF'), ('cache_size', -262144)]
+
+def read_records(path, fmt=None):
+    '''
+    Returns tuple (column names, generator of records, position) of CSV
+    file with header or JSON Lines file at <path>. Records are lists of
+    values in order of the names. Names of JSON Lines file are keys of
+    its first SAMPLE objects. Position is function returning number of
+    characters read so far.
+
+    @path -- path to imported file, str
+    @fmt -- FORMAT_CSV or FORMAT_JSONL, str; guessed from <path> if None
+    '''
+
+    if fmt is None:
+        fmt = export_format(path)
+
+    read = [0]
+
+    def lines(f):
+        for line in f:
+            read[0] = read[0] + len(line)
+            yield line
+
+    def position():
+        return read[0]
+
+    if fmt == FORMAT_CSV:
+        f = open(path, newline='', encoding='utf-8')
+        reader = csv.reader(lines(f))
+        names = next(reader, [])
+
+        def records():
+            try:
+                for rec in reader:
+                    yield rec
+            finally:
+                f.close()
+
+        return (names, records(), position)
+
+    elif fmt == FORMAT_JSONL:
+        f = open(path, encoding='utf-8')
+        objects = (json.loads(line) for line in lines(f) if line.strip())
+        sample = list(islice(objects, SAMPLE))
+        names = []
+
+        for obj in sample:
+            for key in obj:
+                if key not in names:
+                    names.append(key)
+
+        def records():
+            try:
+                for obj in chain(sample, objects):
+                    yield [_json_value(obj.get(n)) for n in names]
+            finally:
+                f.close()
+
+        return (names, records(), position)
+
+    else:
+        raise InvalidParameterError(fmt, False)
+
+def infer_types(records, count):
+    '''
+    Returns declared types (INTEGER, REAL or TEXT) of <count> columns
+    which fit all values of sample <records>. Empty strings and None
+    are treated as NULL.
+
+    @records -- sample records, list(list)
+    @count -- number of columns, int
+    '''
+
+    order = ['INTEGER', 'REAL', 'TEXT']
+    types = []
+
+    for i in range(count):
+        kind = None
+
+        for rec in records:
+            if i >= len(rec) or rec[i] is None or rec[i] == '':
+                continue
+
+            value_kind = _value_type(rec[i])
+
+            if kind is None or order.index(value_kind) > order.index(kind):
+                kind = value_kind
+
+            if kind == 'TEXT':
+                break
+
+        types.append(kind or 'TEXT')
+
+    return types
+
+def import_file(path, db, table_name=None, fmt=None, indexes=None, batch_size=INSERT_BATCH,
+                transaction_rows=TRANSACTION_ROWS, progress=None, cancelled=None):
+    '''
+    Imports CSV or JSON Lines file at <path> into new table of <db>.
+    Column types are inferred from the first SAMPLE records. Rows are
+    inserted by executemany() in batches of <batch_size> and committed
+    every <transaction_rows> rows, with LOAD_PRAGMAS in effect. Indexes
+    are created after all rows are loaded. Returns number of imported
+    rows, or None if import was cancelled; the table is dropped then.
+    The table is dropped also if the import fails, the error is raised.
+    Raises NotConnectedError if database is not connected.
+
+    @path -- path to imported file, str
+    @db -- connected target database, Database
+    @table_name -- name of created table, str; name of the file if None
+    @fmt -- FORMAT_CSV or FORMAT_JSONL, str; guessed from <path> if None
+    @indexes -- names of columns to index, list(str)
+    @batch_size -- number of rows inserted at once, int
+    @transaction_rows -- number of rows inserted in one transaction, int
+    @progress -- called with (imported rows, file position in percents)
+                 after every batch, callable
+    @cancelled -- called after every batch, import stops if it returns
+                  True, callable
+    '''
+
+    if not db.is_connected():
+        raise NotConnectedError(db.name())
+
+    if table_name is None:
+        table_name = os.path.splitext(os.path.basename(path))[0]
+
+    names, records, position = read_records(path, fmt)
+    sample = list(islice(records, SAMPLE))
+    types = infer_types(sample, len(names))
+    converters = [_converter(t) for t in types]
+
+    con = db.connection()
+    cols = ', '.join([quote(n) + ' ' + t for n, t in zip(names, types)])
+    con.execute('CREATE TABLE ' + quote(table_name) + ' (' + cols + ')')
+    con.commit()
+
+    insert = 'INSERT INTO ' + quote(table_name) + ' VALUES (' + ', '.join(['?'] * len(names)) + ')'
+    size = max(os.path.getsize(path), 1)
+    saved = [(name, db.pragma(name)) for name, value in LOAD_PRAGMAS]
+    imported = 0
+    uncommitted = 0
+
+    for name, value in LOAD_PRAGMAS:
+        db.set_pragma(name, value)
+
+    try:
+        batch = []
+
+        for rec in chain(sample, records):
+            if len(rec) < len(names):
+                rec = rec + [None] * (len(names) - len(rec))
+            batch.append([conv(v) for conv, v in zip(converters, rec)])
+
+            if len(batch) < batch_size:
+                continue
+
+            con.executemany(insert, batch)
+            imported = imported + len(batch)
+            uncommitted = uncommitted + len(batch)
+            batch = []
+
+            if uncommitted >= transaction_rows:
+                con.commit()
+                uncommitted = 0
+
+            if progress is not None:
+                progress(imported, min(99, 100 * position() // size))
+
+            if cancelled is not None and cancelled():
+                con.rollback()
+                con.execute('DROP TABLE ' + quote(table_name))
+                con.commit()
+                return None
+
+        if len(batch) > 0:
+            con.executemany(insert, batch)
+            imported = imported + len(batch)
+
+        con.commit()
+
+        for col in indexes or []:
+            con.execute('CREATE INDEX ' + quote('idx_' + table_name + '_' + col) +
+                        ' ON ' + quote(table_name) + ' (' + quote(col) + ')')
+        con.commit()
+    except BaseException:
+        #Leave the transaction before PRAGMAs are restored, SQLite refuses
+        #to change synchronous inside of it, and drop the partial table:
+        con.rollback()
+        try:
+            con.execute('DROP TABLE IF EXISTS ' + quote(table_name))
+            con.commit()
+        except sl.Error:
+            pass
+        raise
+    finally:
+        records.close()
+        for name, value in saved:
+            db.set_pragma(name, value)
+
+    if progress is not None:
+        progress(imported, 100)
+
+    return imported
+
+def _value_type(value):
+    '''
+    Private: Returns INTEGER, REAL or TEXT for <value>. Text is numeric
+    only if it is plain number matched by INTEGER_TEXT or REAL_TEXT, so
+    values like '00042' or '1_000' stay TEXT. Integers out of range of
+    SQLite INTEGER are TEXT.
+    '''
+
+    if type(value) == int:
+        return 'INTEGER' if _fits_integer(value) else 'TEXT'
+    if type(value) == float:
+        return 'REAL'
+
+    return _text_type(value) or 'TEXT'
+
+def _text_type(value):
+    '''
+    Private: Returns INTEGER or REAL if string <value> is plain number
+    of that type, see INTEGER_TEXT and REAL_TEXT, otherwise returns None.
+    Integers out of range of SQLite INTEGER are None.
+    '''
+
+    if type(value) != str:
+        return None
+
+    text = value.strip()
+
+    if INTEGER_TEXT.match(text):
+        if len(text) > 20:
+            return None
+        return 'INTEGER' if _fits_integer(int(text)) else None
+    if REAL_TEXT.match(text):
+        return 'REAL'
+    return None
+
+def _converter(kind):
+    '''
+    Private: Returns function converting imported value to column of
+    declared type <kind>. Empty string is converted to None, values
+    which are not plain numbers of the type are kept as they are.
+    Integers out of range of SQLite INTEGER are converted to str.
+    '''
+
+    def convert(v):
+        if v is None or v == '':
+            return None
+
+        if type(v) == int and not _fits_integer(v):
+            return str(v)
+
+        if kind == 'TEXT':
+            return v
+
+        found = _text_type(v)
+
+        if found == 'INTEGER':
+            return int(v) if kind == 'INTEGER' else float(v)
+        if found == 'REAL' and kind == 'REAL':
+            return float(v)
+        return v
+
+    return convert
+
+def _fits_integer(value):
+    '''
+    Private: Returns True if int <value> fits SQLite INTEGER.
+    '''
+
+    return INTEGER_MIN <= value <= INTEGER_MAX
+
+def _json_value(value):
+    '''
+    Private: Returns JSON value storable in SQLite; lists and objects are
+    stored as JSON text, booleans as integers.
+    '''
+
+    if type(value) in (list, dict):
+        return json.dumps(value, ensure_ascii=False)
+    if type(value) == bool:
+        return int(value)
+    return value
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+'''
+Inspects many SQLite files at once: table inventory, row counts and
+search of a value in TEXT columns. Files are spread across worker
+processes, every file is read through its own read-only connection.
+
+    python3 scan.py data/*.db --search 'foo%' --workers 8 --json report.json
+'''
+
+import sys
+import json
+import argparse
+import sqlite3 as sl
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from database import *
+
+#Maximal number of search hits reported per table:
+HIT_LIMIT = 100
+
+def scan_file(path, counts=True, search=None, mode=COUNT_EXACT, hit_limit=HIT_LIMIT):
+    '''
+    Inspects database at <path> and returns dictionary with its tables
+    and search hits. Errors are reported in the result, not raised, so
+    one broken file does not stop the scan. Runs in worker process.
+
+    @path -- path to database file, str
+    @counts -- count rows of the tables, bool
+    @search -- LIKE pattern searched in TEXT columns, str; no search if None
+    @mode -- COUNT_EXACT or COUNT_ESTIMATE, str
+    @hit_limit -- maximal number of hits per table, int
+    '''
+
+    result = OrderedDict([('path', path), ('tables', []), ('hits', []), ('error', None)])
+    db = Database()
+
+    try:
+        db.connect(path, PROFILE_BROWSE, read_only=True)
+
+        for name in db.table_names():
+            table = Table(name, db)
+            cols = table.get_columns() or []
+            info = OrderedDict([('name', name), ('columns', len(cols)), ('rows', None)])
+
+            try:
+                if counts:
+                    info['rows'] = table.row_count(mode)
+            except TableNotFoundError:
+                continue
+
+            result['tables'].append(info)
+
+            if search is not None:
+                result['hits'].extend(_search_table(table, cols, search, hit_limit))
+    except Exception as er:
+        result['error'] = '{0}: {1}'.format(type(er).__name__, er)
+    finally:
+        if db.is_connected():
+            db.disconnect()
+
+    return result
+
+def scan(paths, counts=True, search=None, mode=COUNT_EXACT, workers=None):
+    '''
+    Generator of results of scan_file() for all <paths>, yielded as
+    soon as each file is done, not in order of <paths>. Files are
+    scanned in parallel by <workers> processes.
+
+    @paths -- paths to database files, list(str)
+    @counts -- count rows of the tables, bool
+    @search -- LIKE pattern searched in TEXT columns, str
+    @mode -- COUNT_EXACT or COUNT_ESTIMATE, str
+    @workers -- number of processes, int; number of CPUs if None
+    '''
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(scan_file, p, counts, search, mode) for p in paths]
+
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def merge(results):
+    '''
+    Combines results of scan_file() into one report, dictionary with
+    totals, hits of all files and results of the files sorted by path.
+
+    @results -- results of scanned files, iterable
+    '''
+
+    files = sorted(results, key=lambda r: r['path'])
+    tables = [t for r in files for t in r['tables']]
+
+    return OrderedDict([
+        ('files', len(files)),
+        ('failed', len([r for r in files if r['error'] is not None])),
+        ('tables', len(tables)),
+        ('rows', sum([t['rows'] or 0 for t in tables])),
+        ('hits', [h for r in files for h in r['hits']]),
+        ('results', files),
+    ])
+
+def _search_table(table, cols, pattern, limit):
+    '''
+    Private: Returns hits of LIKE <pattern> in TEXT columns of <table>
+    as tuples (path, table name, primary key values, column, value).
+    Primary key values are None for tables without primary key.
+    '''
+
+    text = [c.name() for c in cols if c.affinity() == 'TEXT']
+
+    if len(text) == 0:
+        return []
+
+    pks = table.primary_keys()
+    select = [quote(k) for k in pks] + [quote(c) for c in text]
+    flags = [quote(c) + ' LIKE ?' for c in text]
+    stmt = ('SELECT ' + ', '.join(select + flags) + ' FROM ' + quote(table.name()) +
+            ' WHERE ' + ' OR '.join(flags) + ' LIMIT ?')
+
+    try:
+        cur = table.connection().execute(stmt, [pattern] * (2 * len(text)) + [limit])
+    except sl.OperationalError:
+        return []
+
+    hits = []
+    first = len(pks)
+    last = first + len(text)
+
+    for row in cur:
+        key = list(row[:first]) if len(pks) > 0 else None
+        for col, value, matched in zip(text, row[first:last], row[last:]):
+            if matched:
+                hits.append((table.database_path(), table.name(), key, col, value))
+
+    return hits
+
+def main(argv=None):
+    '''
+    Command line entry point. Prints progress of every finished file to
+    stderr and report as JSON or as summary.
+
+    @argv -- command line arguments, list(str)
+    '''
+
+    parser = argparse.ArgumentParser(description='Scan many SQLite files in parallel.')
+    parser.add_argument('paths', nargs='+', help='database files')
+    parser.add_argument('--search', help='LIKE pattern searched in TEXT columns')
+    parser.add_argument('--no-counts', action='store_true', help='do not count rows')
+    parser.add_argument('--estimate', action='store_true', help='estimate row counts')
+    parser.add_argument('--workers', type=int, help='number of processes')
+    parser.add_argument('--json', help='write report to this JSON file, - for stdout')
+    args = parser.parse_args(argv)
+
+    mode = COUNT_ESTIMATE if args.estimate else COUNT_EXACT
+    results = []
+
+    for result in scan(args.paths, not args.no_counts, args.search, mode, args.workers):
+        results.append(result)
+        status = result['error'] or '{0} tables'.format(len(result['tables']))
+        print('[{0}/{1}] {2}: {3}'.format(len(results), len(args.paths), result['path'], status),
+              file=sys.stderr)
+
+    report = merge(results)
+
+    if args.json is not None:
+        text = json.dumps(report, indent=2, default=str)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
+    else:
+        print('{0} files ({1} failed), {2} tables, {3} rows, {4} hits'.format(report['files'],
+              report['failed'], report['tables'], report['rows'], len(report['hits'])))
+        for path, table, key, col, value in report['hits']:
+            print('{0}\t{1}\t{2}\t{3}\t{4}'.format(path, table, key, col, value))
+
+    return 1 if report['failed'] > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,343 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import sqlite3 as sl
+from database import *
+
+#Suffix of sidecar file holding full-text index of a database:
+SIDECAR_SUFFIX = '.fts'
+
+#Maximal number of hits returned by a search:
+SEARCH_LIMIT = 100
+
+#Number of words shown around matched words in snippets:
+SNIPPET_TOKENS = 10
+
+#Affinities of indexed columns:
+TEXT_AFFINITIES = ('TEXT',)
+
+def sidecar_path(db_path):
+    '''
+    Returns path to sidecar index file of database at <db_path>.
+
+    @db_path -- path to the database, str
+    '''
+
+    return db_path + SIDECAR_SUFFIX
+
+def match_phrase(text):
+    '''
+    Returns FTS5 query matching words of <text> as written, so user's
+    input can not be mistaken for FTS5 query syntax. Last word matches
+    as prefix.
+
+    @text -- searched text, str
+    '''
+
+    words = text.split()
+
+    if len(words) == 0:
+        return None
+
+    terms = ['"' + w.replace('"', '""') + '"' for w in words]
+    terms[-1] = terms[-1] + '*'
+    return ' '.join(terms)
+
+def search_all(indexes, text, limit=SEARCH_LIMIT, raw=False):
+    '''
+    Searches several indexes and returns at most <limit> best hits of
+    all of them, see SearchIndex.search().
+
+    @indexes -- searched indexes, list(SearchIndex)
+    @text -- searched text, str
+    @limit -- maximal number of hits, int
+    @raw -- <text> is FTS5 query, bool
+    '''
+
+    hits = []
+
+    for index in indexes:
+        hits.extend(index.search(text, limit, raw, ranked=True))
+
+    hits.sort(key=lambda hit: hit[0])
+    return [hit[1:] for hit in hits[:limit]]
+
+class SearchIndex:
+
+    def __init__(self, db_path, index_path=None):
+        '''
+        Opens full-text index of TEXT columns of database at <db_path>,
+        stored in sidecar file <index_path>; the file is created if it
+        does not exist. Index is brought up to date by update(), which
+        reads only rows added since the last update and tables marked by
+        invalidate(); search() may run from other threads meanwhile.
+        Raises GenericError if the sidecar file can not be opened.
+
+        @db_path -- path to the indexed database, str
+        @index_path -- path to the sidecar file, str; sidecar_path() if None
+        '''
+
+        if index_path is None:
+            index_path = sidecar_path(db_path)
+
+        self._db_path = db_path
+        self._index_path = index_path
+        self._lock = threading.Lock()
+
+        try:
+            self._writer = self._open()
+            self._reader = self._open()
+        except sl.Error as er:
+            raise GenericError(str(er))
+
+        self._version = None
+        self._stale = set()
+
+    def __str__(self):
+        '''
+        Returns path to the sidecar file.
+        '''
+
+        return self._index_path
+
+    def path(self):
+        '''
+        Returns path to the sidecar file.
+        '''
+
+        return self._index_path
+
+    def database_path(self):
+        '''
+        Returns path to the indexed database.
+        '''
+
+        return self._db_path
+
+    def close(self):
+        '''
+        Closes the sidecar file.
+        '''
+
+        with self._lock:
+            self._writer.close()
+            self._reader.close()
+
+    def is_current(self, db):
+        '''
+        Returns True if nothing was written to <db> since the last
+        update() with the same connection, otherwise returns False.
+
+        @db -- connected indexed database, Database
+        '''
+
+        return self._version is not None and self._version == (id(db), db.data_version())
+
+    def invalidate(self, table_name):
+        '''
+        Marks table <table_name> to be indexed again by the next update,
+        for example after its rows were changed in place. Does not wait
+        for running update.
+
+        @table_name -- name of the table, str
+        '''
+
+        self._stale.add(table_name)
+        self._version = None
+
+    def update(self, db, progress=None, cancelled=None):
+        '''
+        Indexes rows of <db> added since the last update, tracked by
+        rowid high-water mark of every table. Tables whose TEXT columns
+        changed, whose rows were removed past the mark, or which were
+        invalidated are indexed again, dropped tables are removed. Tables
+        without rowid and views are not indexed. Rows changed in place or
+        removed below the mark by other programs are found by rebuild().
+        Returns number of indexed values; nothing is read if data version
+        of <db> did not change since the last update.
+
+        @db -- connected indexed database, Database
+        @progress -- called with (done tables, all tables), callable
+        @cancelled -- called between batches, update stops if it returns
+                      True, callable
+        '''
+
+        with self._lock:
+            version = (id(db), db.data_version())
+
+            if self._version == version:
+                return 0
+
+            for name in list(self._stale):
+                self._stale.discard(name)
+                self._drop(name)
+
+            names = db.table_names()
+            state = dict([(row[0], row[1:]) for row in
+                          self._writer.execute('SELECT tbl, high, cols FROM state')])
+            indexed = 0
+
+            for name in state:
+                if name not in names:
+                    self._drop(name)
+
+            for i, name in enumerate(names):
+                if cancelled is not None and cancelled():
+                    return indexed
+
+                indexed = indexed + self._update_table(db.get_table(name), state.get(name),
+                                                       cancelled)
+
+                if progress is not None:
+                    progress(i + 1, len(names))
+
+            self._version = version
+            return indexed
+
+    def rebuild(self, db, progress=None, cancelled=None):
+        '''
+        Drops whole index and indexes all rows of <db> again.
+        Returns number of indexed values.
+
+        @db -- connected indexed database, Database
+        '''
+
+        with self._lock:
+            self._writer.execute('DELETE FROM fts')
+            self._writer.execute('DELETE FROM state')
+            self._writer.commit()
+            self._version = None
+
+        return self.update(db, progress, cancelled)
+
+    def search(self, text, limit=SEARCH_LIMIT, raw=False, ranked=False):
+        '''
+        Returns list of at most <limit> best hits of <text>. Every hit is
+        tuple (database path, table name, primary key values, column
+        name, snippet); primary key values are [rowid] for tables without
+        primary key. Matched words are enclosed in [] in snippets.
+        Raises GenericError if <text> is not valid FTS5 query.
+
+        @text -- searched words, str; last one matches as prefix
+        @limit -- maximal number of hits, int
+        @raw -- <text> is FTS5 query, bool
+        @ranked -- prepend rank of hit to the tuple, bool
+        '''
+
+        query = text if raw else match_phrase(text)
+
+        if not query:
+            return []
+
+        stmt = ('SELECT rank, tbl, pk, col, snippet(fts, 3, \'[\', \']\', \'...\', ?) '
+                'FROM fts WHERE fts MATCH ? ORDER BY rank LIMIT ?')
+
+        try:
+            rows = self._reader.execute(stmt, (SNIPPET_TOKENS, query, limit)).fetchall()
+        except sl.Error as er:
+            raise GenericError(str(er))
+
+        hits = []
+
+        for rank, tbl, pk, col, snippet in rows:
+            hit = (self._db_path, tbl, json.loads(pk), col, snippet)
+            hits.append((rank,) + hit if ranked else hit)
+
+        return hits
+
+    def _open(self):
+        '''
+        Private: Returns connection to the sidecar file; creates its
+        tables if needed.
+        '''
+
+        con = sl.connect(self._index_path, check_same_thread=False)
+        con.execute('PRAGMA journal_mode = WAL')
+        con.execute('CREATE VIRTUAL TABLE IF NOT EXISTS fts USING '
+                    'fts5(tbl UNINDEXED, col UNINDEXED, pk UNINDEXED, value)')
+        con.execute('CREATE TABLE IF NOT EXISTS state '
+                    '(tbl TEXT PRIMARY KEY, high INTEGER, cols TEXT)')
+        con.commit()
+        return con
+
+    def _drop(self, name):
+        '''
+        Private: Removes table <name> from the index.
+        '''
+
+        self._writer.execute('DELETE FROM fts WHERE tbl = ?', (name,))
+        self._writer.execute('DELETE FROM state WHERE tbl = ?', (name,))
+        self._writer.commit()
+
+    def _update_table(self, table, state, cancelled):
+        '''
+        Private: Indexes rows of <table> past high-water mark in <state>,
+        tuple (high, columns) or None. Only rows past the mark are read,
+        so cost of the update does not grow with size of the table.
+        Returns number of indexed values.
+        '''
+
+        cols = [c.name() for c in table.get_columns() or [] if c.affinity() in TEXT_AFFINITIES]
+        pks = table.primary_keys()
+        source = table.connection()
+
+        try:
+            top = source.execute('SELECT max(_rowid_) FROM ' + quote(table.name())).fetchone()[0]
+        except sl.OperationalError:
+            #View or table without rowid:
+            return 0
+
+        if state is not None and (state[1] != json.dumps(cols) or top is None or top < state[0]):
+            self._drop(table.name())
+            state = None
+
+        high = state[0] if state is not None else -2**63
+
+        if len(cols) == 0 or top is None or top <= high:
+            if state is None:
+                self._save_state(table.name(), top or 0, cols)
+            return 0
+
+        select = ', '.join(['_rowid_'] + [quote(k) for k in pks] + [quote(c) for c in cols])
+        stmt = ('SELECT ' + select + ' FROM ' + quote(table.name()) +
+                ' WHERE _rowid_ > ? ORDER BY _rowid_ LIMIT ?')
+        insert = 'INSERT INTO fts (tbl, col, pk, value) VALUES (?, ?, ?, ?)'
+        first = 1 + len(pks)
+        indexed = 0
+
+        while True:
+            rows = source.execute(stmt, (high, BATCH_SIZE)).fetchall()
+
+            if len(rows) == 0:
+                break
+
+            values = []
+
+            for row in rows:
+                pk = json.dumps(list(row[1:first]) if len(pks) > 0 else [row[0]], default=str)
+
+                for col, value in zip(cols, row[first:]):
+                    if type(value) == str and value != '':
+                        values.append((table.name(), col, pk, value))
+
+            high = rows[-1][0]
+            self._writer.executemany(insert, values)
+            self._save_state(table.name(), high, cols)
+            indexed = indexed + len(values)
+
+            if cancelled is not None and cancelled():
+                break
+
+        return indexed
+
+    def _save_state(self, name, high, cols):
+        '''
+        Private: Stores high-water mark <high> of table <name> together
+        with indexed values, so both survive or both are lost.
+        '''
+
+        self._writer.execute('INSERT OR REPLACE INTO state (tbl, high, cols) VALUES (?, ?, ?)',
+                             (name, high, json.dumps(cols)))
+        self._writer.commit()
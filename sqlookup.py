@@ -2,10 +2,28 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import gui as Gui
-from PySide import QtGui
+import time
 
-if __name__ == "__main__":
-    app = QtGui.QApplication(sys.argv)
+def run_gui(argv):
+    '''
+    Starts the GUI. Qt is imported only here.
+    
+    @argv -- command line arguments, list(str)
+    '''
+    
+    import gui as Gui
+    from PySide import QtGui
+    
+    app = QtGui.QApplication(argv)
     wnd = Gui.SQLookup()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    import cli
+    
+    #Commands run headless, anything else starts the GUI:
+    if len(sys.argv) > 1 and (sys.argv[1] in cli.COMMANDS or sys.argv[1] in ('-h', '--help')):
+        sys.exit(cli.main(sys.argv[1:], time.perf_counter() - start))
+        
+    sys.exit(run_gui(sys.argv))
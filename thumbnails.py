@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import os
+import hashlib
+from collections import OrderedDict
+from PySide import QtGui, QtCore
+from database import *
+
+#Default memory budget of ThumbnailCache in bytes:
+CACHE_BYTES = 32 * 1024 * 1024
+
+def read_blob(img):
+    '''
+    Reads data from file-like <img> by chunks directly into QByteArray,
+    so no other full copy of the data is created. Closes <img>.
+
+    @img -- image data, file-like object returned by Table.open_blob()
+    '''
+
+    data = QtCore.QByteArray()
+
+    try:
+        while True:
+            chunk = img.read(BLOB_CHUNK)
+            if not chunk:
+                break
+            data.append(chunk)
+    finally:
+        img.close()
+
+    return data
+
+def decode_scaled(img, size):
+    '''
+    Decodes image from <img> directly at size fitting into <size> x <size>
+    with kept aspect ratio; smaller images are not enlarged. Decoder is
+    told the target size, so full resolution image is never built for
+    formats supporting it (JPEG). Returns null QImage if data are not
+    an image.
+
+    @img -- image data, file-like object returned by Table.open_blob()
+    @size -- maximal width and height, int
+    '''
+
+    data = read_blob(img)
+    buf = QtCore.QBuffer(data)
+    buf.open(QtCore.QIODevice.ReadOnly)
+
+    reader = QtGui.QImageReader(buf)
+    full = reader.size()
+
+    if full.isValid() and (full.width() > size or full.height() > size):
+        scaled = QtCore.QSize(full)
+        scaled.scale(size, size, QtCore.Qt.KeepAspectRatio)
+        reader.setScaledSize(scaled)
+
+    image = reader.read()
+    buf.close()
+    return image
+
+class ThumbnailCache:
+
+    def __init__(self, max_bytes=CACHE_BYTES, directory=None):
+        '''
+        Creates cache of decoded thumbnails. Least recently used images
+        are dropped from memory when they take more than <max_bytes>.
+        If <directory> is given, thumbnails are also stored there as PNG
+        files and survive restart of the application.
+
+        @max_bytes -- memory budget in bytes, int
+        @directory -- directory of on-disk cache, str; None to disable
+        '''
+
+        self._max_bytes = max_bytes
+        self._directory = directory
+        self._images = OrderedDict()
+        self._bytes = 0
+
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, table, col_id, pk_vals):
+        '''
+        Returns cache key of value of column <col_id> in row of <table>
+        identified by <pk_vals>. Key includes data version of database,
+        so thumbnails of changed data are not found.
+
+        @table -- table of the value, Table
+        @col_id -- id of the column, int
+        @pk_vals -- primary key values, list
+        '''
+
+        return (table.database_path(), table.name(), col_id, tuple(pk_vals),
+                table.database().data_version())
+
+    def get(self, key):
+        '''
+        Returns cached thumbnail for <key> or None.
+
+        @key -- key returned by key(), tuple
+        '''
+
+        image = self._images.get(key)
+
+        if image is not None:
+            self._images.move_to_end(key)
+            return image
+
+        path = self._file(key)
+
+        if path is not None and os.path.isfile(path):
+            image = QtGui.QImage(path)
+            if not image.isNull():
+                self._remember(key, image)
+                return image
+
+        return None
+
+    def put(self, key, image):
+        '''
+        Stores thumbnail <image> for <key>.
+
+        @key -- key returned by key(), tuple
+        @image -- thumbnail, QtGui.QImage
+        '''
+
+        if image.isNull():
+            return
+
+        self._remember(key, image)
+        path = self._file(key)
+
+        if path is not None:
+            image.save(path, 'PNG')
+
+    def clear(self):
+        '''
+        Drops thumbnails kept in memory.
+        '''
+
+        self._images = OrderedDict()
+        self._bytes = 0
+
+    def _remember(self, key, image):
+        '''
+        Private: Keeps <image> in memory and drops least recently used
+        images over the budget.
+        '''
+
+        if key in self._images:
+            self._bytes = self._bytes - self._images.pop(key).byteCount()
+
+        self._images[key] = image
+        self._bytes = self._bytes + image.byteCount()
+
+        while self._bytes > self._max_bytes and len(self._images) > 1:
+            old_key, old = self._images.popitem(last=False)
+            self._bytes = self._bytes - old.byteCount()
+
+    def _file(self, key):
+        '''
+        Private: Returns path of on-disk thumbnail for <key> or None if
+        on-disk cache is disabled. Modification time and size of the
+        database file are part of the name, because data version is
+        meaningful only within one connection.
+        '''
+
+        if self._directory is None:
+            return None
+
+        try:
+            stat = os.stat(key[0])
+        except OSError:
+            return None
+
+        name = repr(key + (stat.st_mtime_ns, stat.st_size)).encode('utf-8')
+        return os.path.join(self._directory, hashlib.sha1(name).hexdigest() + '.png')
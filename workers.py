@@ -0,0 +1,368 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+import threading
+from PySide import QtCore
+from database import *
+from export import *
+from importer import *
+from search import *
+
+#Seconds between checks for cancellation while waiting for pooled connection:
+CHECKOUT_POLL = 0.2
+
+class JobSignals(QtCore.QObject):
+    '''
+    Signals emitted by jobs. All of them carry path of the database
+    the job works with.
+    '''
+
+    progress = QtCore.Signal(str, int, int)
+    partial = QtCore.Signal(str, object)
+    result = QtCore.Signal(str, object)
+    failed = QtCore.Signal(str, str)
+    finished = QtCore.Signal(object)
+
+class Job(QtCore.QRunnable):
+
+    #Running statement is interrupted on cancel; False for jobs which
+    #clean up after themselves when they see the request:
+    INTERRUPTIBLE = True
+
+    def __init__(self, db_path, pool=None):
+        '''
+        Constructs job working with database at <db_path>. Job takes
+        read-only connection from <pool> or, without pool, opens its own
+        connection in the thread it runs in.
+
+        @db_path -- path to the database, str
+        @pool -- pool of read-only connections, ReadPool
+        '''
+
+        super(Job, self).__init__()
+        self.setAutoDelete(False)
+
+        self.signals = JobSignals()
+        self._db_path = db_path
+        self._pool = pool
+        self._cancelled = False
+        self._kept = False
+        self._db = None
+        self._db_lock = threading.Lock()
+
+    def path(self):
+        '''
+        Returns path to the database.
+        '''
+
+        return self._db_path
+
+    def cancel(self):
+        '''
+        Asks job to stop. Statement running on job's connection is
+        interrupted, otherwise job checks the request between steps of
+        its work; result of cancelled job is not emitted.
+        '''
+
+        self._cancelled = True
+
+        with self._db_lock:
+            if self.INTERRUPTIBLE and self._db is not None and self._db.is_connected():
+                self._db.connection().interrupt()
+
+    def is_cancelled(self):
+        '''
+        Returns True if job was cancelled, otherwise returns False.
+        '''
+
+        return self._cancelled
+
+    def keep_connection(self):
+        '''
+        Leaves pooled connection taken after work() returns, its result
+        is responsible for returning it, see PooledCursor.
+        '''
+
+        self._kept = True
+
+    def run(self):
+        '''
+        Reimplemented Qt's run. Connects the database, does the work
+        and emits the result or the error.
+        '''
+
+        db = None
+
+        try:
+            if self._pool is not None:
+                db = self._checkout()
+            else:
+                db = Database()
+                db.connect(self._db_path)
+
+            with self._db_lock:
+                self._db = db
+
+            if self._cancelled:
+                return
+
+            result = self.work(db)
+        except Exception as er:
+            if not self._cancelled:
+                self.signals.failed.emit(self._db_path, str(er))
+        else:
+            if not self._cancelled:
+                self.signals.result.emit(self._db_path, result)
+        finally:
+            #Connection returned to the pool must not be interrupted anymore:
+            with self._db_lock:
+                self._db = None
+
+            if self._pool is not None and db is not None:
+                if not self._kept:
+                    self._pool.checkin(db)
+            elif db is not None and db.is_connected():
+                db.disconnect()
+            self.signals.finished.emit(self)
+
+    def _checkout(self):
+        '''
+        Private: Takes connection from the pool. Waiting for it stops
+        when the job is cancelled; returns None then.
+        '''
+
+        while not self._cancelled:
+            try:
+                return self._pool.checkout(CHECKOUT_POLL)
+            except PoolTimeoutError:
+                continue
+
+        return None
+
+    def work(self, db):
+        '''
+        Does the work of the job and returns its result.
+        Reimplemented in subclasses.
+
+        @db -- connected database, Database
+        '''
+
+        raise NotImplementedError
+
+class OpenDatabaseJob(Job):
+
+    def work(self, db):
+        '''
+        Checks the file is a database by reading its catalog. Returns
+        names of the tables.
+
+        @db -- connected database, Database
+        '''
+
+        return db.table_names()
+
+class RowCountJob(Job):
+
+    def __init__(self, db_path, table_names, pool=None):
+        '''
+        Constructs job counting rows and columns of <table_names>. Every
+        count is emitted by partial signal as tuple (table name, row
+        count, column count) as soon as it is known.
+
+        @db_path -- path to the database, str
+        @table_names -- names of counted tables, list(str)
+        @pool -- pool of read-only connections, ReadPool
+        '''
+
+        super(RowCountJob, self).__init__(db_path, pool)
+        self._table_names = table_names
+
+    def work(self, db):
+        '''
+        Counts rows of the tables. Returns number of counted tables.
+
+        @db -- connected database, Database
+        '''
+
+        counted = 0
+
+        for name in self._table_names:
+            if self.is_cancelled():
+                break
+
+            table = Table(name, db)
+
+            try:
+                count = table.row_count()
+            except TableNotFoundError:
+                continue
+
+            counted = counted + 1
+            self.signals.partial.emit(self._db_path, (name, count, table.column_count()))
+            self.signals.progress.emit(self._db_path, counted, len(self._table_names))
+
+        return counted
+
+class LoadTableJob(Job):
+
+    def __init__(self, db_path, table_name, limit, pool=None, where=None, order_by=None):
+        '''
+        Constructs job reading first page of <table_name>, optionally
+        filtered by <where> and sorted by <order_by>, see Table.query().
+        Filtered or sorted rows are read from connection of <pool>,
+        which is needed then.
+        Raises InvalidParameterError if such rows are asked without pool.
+
+        @db_path -- path to the database, str
+        @table_name -- name of the table, str
+        @limit -- number of rows of the page, int
+        @pool -- pool of read-only connections, ReadPool
+        @where -- SQL expression of WHERE clause, str
+        @order_by -- column names or tuples (column name, descending), list
+        '''
+
+        if pool is None and (where is not None or order_by is not None):
+            raise InvalidParameterError(pool, False)
+
+        super(LoadTableJob, self).__init__(db_path, pool)
+        self._table_name = table_name
+        self._limit = limit
+        self._where = where
+        self._order_by = order_by
+
+    def work(self, db):
+        '''
+        Reads the first page. Returns tuple (table name, where, order by,
+        rows, key of the last row, cursor). Without filter and sort order
+        rows are paged by key, every row starts with its row key values,
+        see Table.page(), and rows are None if the table can not be
+        paged. Otherwise key is None and cursor reading further rows is
+        PooledCursor, which holds its connection until it is closed;
+        cursor is None when all rows were read.
+
+        @db -- connected database, Database
+        '''
+
+        table = Table(self._table_name, db)
+        query = (self._table_name, self._where, self._order_by)
+
+        if self._where is None and self._order_by is None:
+            try:
+                rows, last = table.page(None, self._limit, with_keys=True)
+            except TableNotFoundError:
+                rows, last = None, None
+
+            return query + (rows, last, None)
+
+        cursor = table.query(self._where, (), self._order_by)
+        rows = cursor.fetchmany(self._limit)
+
+        if len(rows) < self._limit:
+            cursor.close()
+            return query + (rows, None, None)
+
+        self.keep_connection()
+        return query + (rows, None, PooledCursor(self._pool, db, cursor))
+
+class ExportJob(Job):
+
+    #export_table() removes incomplete file when it sees the cancel request:
+    INTERRUPTIBLE = False
+
+    def __init__(self, db_path, table_name, target, blobs=BLOB_BASE64, pool=None):
+        '''
+        Constructs job exporting <table_name> to file <target>, see
+        export.export_table(). Progress is emitted after every batch.
+
+        @db_path -- path to the database, str
+        @table_name -- name of the table, str
+        @target -- path to exported file, str
+        @blobs -- BLOB_BASE64 or BLOB_FILES, str
+        @pool -- pool of read-only connections, ReadPool
+        '''
+
+        super(ExportJob, self).__init__(db_path, pool)
+        self._table_name = table_name
+        self._target = target
+        self._blobs = blobs
+
+    def work(self, db):
+        '''
+        Exports the table. Returns tuple (target path, written rows).
+
+        @db -- connected database, Database
+        '''
+
+        def progress(done, total):
+            self.signals.progress.emit(self._db_path, done, total)
+
+        rows = export_table(Table(self._table_name, db), self._target, blobs=self._blobs,
+                            progress=progress, cancelled=self.is_cancelled)
+        return (self._target, rows)
+
+class ImportJob(Job):
+
+    #import_file() drops the table when it sees the cancel request:
+    INTERRUPTIBLE = False
+
+    def __init__(self, db_path, source, indexes=None):
+        '''
+        Constructs job importing CSV or JSON Lines file <source> into new
+        table of database at <db_path>, see importer.import_file().
+        Database is created if it does not exist.
+
+        @db_path -- path to the target database, str
+        @source -- path to imported file, str
+        @indexes -- names of columns to index, list(str)
+        '''
+
+        super(ImportJob, self).__init__(db_path)
+        self._source = source
+        self._indexes = indexes
+
+    def work(self, db):
+        '''
+        Imports the file. Returns number of imported rows.
+
+        @db -- connected database, Database
+        '''
+
+        def progress(done, percent):
+            self.signals.progress.emit(self._db_path, percent, 100)
+
+        return import_file(self._source, db, indexes=self._indexes,
+                           progress=progress, cancelled=self.is_cancelled)
+
+class IndexJob(Job):
+
+    def __init__(self, db_path, index, pool=None, rebuild=False):
+        '''
+        Constructs job bringing full-text <index> of the database up to
+        date, see SearchIndex.update(), or building it again from scratch
+        if <rebuild>, see SearchIndex.rebuild(). Progress is emitted per
+        table.
+
+        @db_path -- path to the database, str
+        @index -- full-text index of the database, SearchIndex
+        @pool -- pool of read-only connections, ReadPool
+        @rebuild -- index all rows again, bool
+        '''
+
+        super(IndexJob, self).__init__(db_path, pool)
+        self._index = index
+        self._rebuild = rebuild
+
+    def work(self, db):
+        '''
+        Indexes new rows, or all rows when rebuilding. Returns number of
+        indexed values.
+
+        @db -- connected database, Database
+        '''
+
+        def progress(done, total):
+            self.signals.progress.emit(self._db_path, done, total)
+
+        if self._rebuild:
+            return self._index.rebuild(db, progress, self.is_cancelled)
+        return self._index.update(db, progress, self.is_cancelled)